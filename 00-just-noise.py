@@ -1,79 +1,114 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pygame
-import noise
-from colors import BLACK
-
-# Initialize Pygame
-pygame.init()
+from procgen.colors import BLACK
+from procgen.octaves import NoiseSlice3, OctaveCache
+from procgen.viewer import init
 
 # Screen dimensions
 width, height = 800, 600
-screen = pygame.display.set_mode((width, height))
-pygame.display.set_caption("Noise Animation")
 
-# Font settings
-font = pygame.font.SysFont('Arial', 24)
+# Colors
+def noise_to_color(values):
+    values = (values.astype(np.float64) + 1) / 2 * 255  # Normalize to range [0, 255]
+    gray = np.clip(values, 0, 255).astype(np.uint8)
+    return np.repeat(gray[:, :, None], 3, axis=2)
+
+# Octave layers of recent slices are cached, so while paused changing the
+# octave count only computes (or drops) one layer
+octave_cache = OctaveCache(max_bytes=64 * 2**20)
 
-# Noise parameters
-scale = 100.0
-octaves = 1
-altitude = 0
+def noise_frame(noise_type, scale, octaves, altitude):
+    # Generate a whole altitude slice as one RGB array
+    noise_values = octave_cache.fbm(NoiseSlice3(noise_type, scale, width, height, altitude), octaves)
+    return noise_to_color(noise_values)
 
-# Colors
-def noise_to_color(value):
-    value = (value + 1) / 2 * 255  # Normalize to range [0, 255]
-    return (int(value), int(value), int(value))
-
-# Main loop
-running = True
-noise_type = "perlin"  # Default noise type
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_q:
+def main():
+    screen = init(width, height, "Noise Animation")
+
+    # Font settings
+    font = pygame.font.SysFont('Arial', 24)
+
+    # Noise parameters
+    scale = 100.0
+    octaves = 1
+    altitude = 0
+    paused = False
+    max_fps = 60  # Frame cap while animating; 0 runs uncapped
+
+    # Frames are pipelined: the next slice is computed on a worker thread while
+    # the current one is on screen
+    worker = ThreadPoolExecutor(max_workers=1)
+    clock = pygame.time.Clock()
+
+    # Main loop
+    running = True
+    noise_type = "perlin"  # Default noise type
+    next_params = (noise_type, scale, octaves, altitude)
+    next_frame = worker.submit(noise_frame, *next_params)
+    shown = None  # Parameters of the frame on screen
+    while running:
+        # Once a paused frame is on screen nothing changes until the next event,
+        # so block instead of spinning
+        idle = paused and shown == (noise_type, scale, octaves, altitude)
+        events = [pygame.event.wait()] if idle else []
+        exposed = False
+        for event in events + pygame.event.get():
+            if event.type == pygame.QUIT:
                 running = False
-            if event.key == pygame.K_s:
-                noise_type = "simplex"
-            if event.key == pygame.K_p:
-                noise_type = "perlin"
-            if event.key == pygame.K_COMMA:
-                octaves = max(1, octaves - 1)
-            if event.key == pygame.K_PERIOD:
-                octaves += 1
-            if event.key == pygame.K_LEFTBRACKET:
-                scale = max(1, scale / 1.2)
-            if event.key == pygame.K_RIGHTBRACKET:
-                scale *= 1.2
-
-    # Update noise altitude for animation effect
-    altitude += 0.03
-
-    # Generate and draw noise
-    for y in range(height):
-        for x in range(width):
-            if noise_type == "simplex":
-                noise_value = noise.snoise3(
-                    x / scale, y / scale, altitude, octaves=octaves
-                )
-            else:  # Perlin
-                noise_value = noise.pnoise3(
-                    x / scale, y / scale, altitude, octaves=octaves
-                )
-            color = noise_to_color(noise_value)
-            screen.set_at((x, y), color)
-
-    # Render text
-    type_text = font.render(f"Type: {noise_type}", True, BLACK)
-    scale_text = font.render(f"Scale: {scale:.2f}", True, BLACK)
-    octaves_text = font.render(f"Octaves: {octaves}", True, BLACK)
-    altitude_text = font.render(f"Altitude: {altitude:.2f}", True, BLACK)
-
-    # Draw text on the screen
-    screen.blit(type_text, (10, 10))
-    screen.blit(scale_text, (10, 40))
-    screen.blit(octaves_text, (10, 70))
-    screen.blit(altitude_text, (10, 100))
-
-    # Update the display
-    pygame.display.flip()
\ No newline at end of file
+            if event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                exposed = True
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_q:
+                    running = False
+                if event.key == pygame.K_s:
+                    noise_type = "simplex"
+                if event.key == pygame.K_p:
+                    noise_type = "perlin"
+                if event.key == pygame.K_COMMA:
+                    octaves = max(1, octaves - 1)
+                if event.key == pygame.K_PERIOD:
+                    octaves += 1
+                if event.key == pygame.K_LEFTBRACKET:
+                    scale = max(1, scale / 1.2)
+                if event.key == pygame.K_RIGHTBRACKET:
+                    scale *= 1.2
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+
+        # Update noise altitude for animation effect
+        if not paused:
+            altitude += 0.03
+
+        current = (noise_type, scale, octaves, altitude)
+        if shown != current:
+            # Show the slice computed in the background and start on the next one
+            frame, shown = next_frame.result(), next_params
+            next_params = current
+            next_frame = worker.submit(noise_frame, *current)
+        elif not exposed:
+            continue
+        pygame.surfarray.blit_array(screen, frame)
+
+        # Render text
+        type_text = font.render(f"Type: {noise_type}", True, BLACK)
+        scale_text = font.render(f"Scale: {scale:.2f}", True, BLACK)
+        octaves_text = font.render(f"Octaves: {octaves}", True, BLACK)
+        altitude_text = font.render(f"Altitude: {altitude:.2f}", True, BLACK)
+        fps_text = font.render(f"FPS: {clock.get_fps():.1f}", True, BLACK)
+
+        # Draw text on the screen
+        screen.blit(type_text, (10, 10))
+        screen.blit(scale_text, (10, 40))
+        screen.blit(octaves_text, (10, 70))
+        screen.blit(altitude_text, (10, 100))
+        screen.blit(fps_text, (10, 130))
+
+        # Update the display
+        pygame.display.flip()
+        clock.tick(max_fps)
+
+    worker.shutdown(cancel_futures=True)
+
+if __name__ == "__main__":
+    main()
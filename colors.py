@@ -1,7 +1 @@
-# Define colors
-BLACK = (0,0,0)
-GREEN = (34, 139, 34)
-SAND = (231,196,150)
-BROWN = (139,69,19)
-BLUE = (0, 0, 255)
-WHITE = (255, 255, 255)
\ No newline at end of file
+from procgen.colors import BLACK, BLUE, BROWN, GREEN, SAND, WHITE
@@ -1,125 +1,358 @@
-from typing import Tuple
-import noise
-import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+import time
 import pygame
-from colors import BLACK, BLUE, BROWN, GREEN, SAND, WHITE
+from procgen import (ChunkedWorld, MapParams, MapPipeline, MapPyramid, Recorder, Regenerator, TerrainEditor, add_sink,
+                     profiled, random_seed)
+from procgen.editor import BRUSH_RADIUS, MAX_BRUSH_RADIUS, MIN_BRUSH_RADIUS
+from procgen.viewer import init as init_window, make_surface
 
 WIDTH, HEIGHT = 800, 600
+PAN_STEP = 64  # Pixels per arrow-key press in infinite world mode
+THRESHOLD_STEP = 0.01
+LAND_STEP = 0.01  # Land fraction change per ;/' press
+FALLOFF_STEP = 0.05
+EROSION_ITERATIONS = 50  # Erosion passes while erosion is toggled on with E
+MIN_MAP_ZOOM, MAX_MAP_ZOOM = -3, 3  # Mouse-wheel zoom range of the island map
+MAP_ORIGIN = (0, 0, 0)  # Unzoomed map view, drawn from the regenerator
+TRACE_PATH = "trace.json"  # Written by the T key; open in chrome://tracing or Perfetto
+MAX_FPS = 60  # Redraw cap while the view is changing; 0 disables it
+BRUSH_SCALE = 1.25  # Brush radius change per mouse-wheel step in edit mode
+
+PIPELINE = MapPipeline()
+RECORDER = add_sink(Recorder())
+
+# Background work wakes the event loop with these
+REGENERATED = pygame.event.custom_type()
+TILE_READY = pygame.event.custom_type()
+HUD_TICK = pygame.event.custom_type()
+REDRAW_EVENTS = {pygame.KEYDOWN, pygame.MOUSEWHEEL, pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE,
+                 REGENERATED, TILE_READY, HUD_TICK}
 
 def init():
-    pygame.init()
-    window = pygame.display.set_mode((WIDTH, HEIGHT))
-    pygame.display.set_caption("2D Noise Terrain")
+    window = init_window(WIDTH, HEIGHT)
+    # Nothing uses mouse motion; don't wake up for it
+    pygame.event.set_blocked(pygame.MOUSEMOTION)
     return window
 
-def generate_noise(width, height, scale, octaves, seed):
-    noise_map = np.zeros((width, height))  # Note (width, height)
-    for x in range(width):
-        for y in range(height):
-            noise_value = noise.snoise2(
-                x / scale, y / scale, octaves=octaves, base=seed
-            )
-            # Normalize noise_value from [-1, 1] to [0, 1]
-            noise_map[x][y] = (noise_value + 1) / 2  # Note (x, y) indexing
-    return noise_map
-
-def generate_radial_gradient(width, height):
-    # Create 1D arrays using linspace
-    x = np.linspace(-1, 1, width)
-    y = np.linspace(-1, 1, height)
-    # Create 2D grid using meshgrid
-    X, Y = np.meshgrid(x, y, indexing='ij')  # Ensure correct shape with indexing='ij'
-    # Compute the normalized distance from the center
-    R = np.sqrt(X**2 + Y**2)
-    # Normalize distances so that the maximum distance is 1
-    R = R / np.max(R) 
-    # Define the gradient function with a plateau and sharp falloff
-    plateau_radius = 0.2
-    falloff_radius = 0.7
-    gradient = np.piecewise(R,
-                        [R <= plateau_radius,
-                         (R > plateau_radius) & (R <= falloff_radius),
-                         R > falloff_radius],
-                        [1,
-                         lambda R: 0.5 * (1 + np.cos(np.pi * (R - plateau_radius) / (falloff_radius - plateau_radius))),
-                         0])
-    return gradient
-
-def add_noise(width, height, gradient, noise_scale, noise_seed):
-    noise_map = generate_noise(width, height, noise_scale, 4, noise_seed)
-    combined_gradient = gradient * noise_map
-    # Normalize the combined gradient
-    combined_gradient = (combined_gradient - combined_gradient.min()) / (combined_gradient.max() - combined_gradient.min())
-    return combined_gradient
-
-def shade_color(color: Tuple[int, int, int], min: float, max: float, value: float) -> Tuple[int, int, int]:
-    if max == 0:
-        return color
-    if value < 0:
-        return (0,0,0)
-    multiplier = float(1 - (((max - value) / max) * .75))
-    bright = tuple(int(element * multiplier) for element in color)
-    return bright
-
-def get_color(value, threshold=0.15):
-    bottom = 0
-    sea = threshold 
-    beach = threshold + 0.05
-    grass = threshold + 0.18
-    hills = threshold + 0.28
-    snow = 1
-    if value < sea:
-        return shade_color(BLUE, bottom, sea, value)  # Deep Water
-    elif value < beach:
-        return shade_color(SAND, sea, beach, value)  # Beach
-    elif value < grass:
-        return shade_color(GREEN, beach, grass, value)  # Grass
-    elif value < hills:
-        return shade_color(BROWN, grass, hills, value) # Hills
-    else:
-        return shade_color(WHITE, hills, snow, value)  # Snow caps
-
-def create_map(width, height):
-    # Parameters for Perlin noise
-    scale = 200.0         # Larger scale for more contiguous areas
-    octaves = 4          # Fewer octaves for less detail
-    seed = np.random.randint(0, 100)
-    # Generate noise map
-    noise_map = generate_noise(width, height, scale, octaves, seed)
-    # Generate radial gradient
-    gradient = generate_radial_gradient(width, height)
-    # Add noise, make a combined gradient
-    noise_scale = 150.0
-    combined_gradient = add_noise(width, height, gradient, noise_scale, seed)
-    # Multiply the noise map by the combined gradient
-    combined_map = noise_map * combined_gradient
-    # Create terrain map
-    threshold = 0.2 # Adjust this value to control the land-water ratio
-    terrain_map = np.zeros((width, height, 3), dtype=np.uint8)  
-    for x in range(width):
-        for y in range(height):
-            color = get_color(combined_map[x][y], threshold)  
-            terrain_map[x][y] = color  
-    # Convert terrain map to Pygame surface
-    surface = pygame.surfarray.make_surface(terrain_map)
+def notify(event_type):
+    # Safe to call from worker threads
+    if pygame.display.get_init():
+        pygame.event.post(pygame.event.Event(event_type))
+
+def random_params(width, height):
+    return MapParams(width, height, random_seed())
+
+def map_surface(rgb):
+    # Previews are rendered at a fraction of the window size; scale them up
+    surface = profiled('make_surface', lambda: make_surface(rgb))
+    if surface.get_size() != (WIDTH, HEIGHT):
+        surface = pygame.transform.scale(surface, (WIDTH, HEIGHT))
     return surface
 
+def create_world_view(world, view):
+    x, y, zoom = view
+    return make_surface(world.render(x, y, WIDTH, HEIGHT, zoom))
+
+def pan_world_view(world, surface, view, dx, dy):
+    # Scroll the current view and only render the newly exposed edge
+    x, y, zoom = view
+    x, y = x + dx, y + dy
+    surface.scroll(-dx, -dy)
+    if dx:
+        edge_x = x + WIDTH - dx if dx > 0 else x
+        strip = world.render(edge_x, y, abs(dx), HEIGHT, zoom)
+        surface.blit(make_surface(strip), (edge_x - x, 0))
+    if dy:
+        edge_y = y + HEIGHT - dy if dy > 0 else y
+        strip = world.render(x, edge_y, WIDTH, abs(dy), zoom)
+        surface.blit(make_surface(strip), (0, edge_y - y))
+    return (x, y, zoom)
+
+def zoom_world_view(view, steps):
+    # Keep the pixel at the center of the window in place
+    x, y, zoom = view
+    factor = 2.0 ** steps
+    x = int((x + WIDTH // 2) * factor) - WIDTH // 2
+    y = int((y + HEIGHT // 2) * factor) - HEIGHT // 2
+    return (x, y, zoom + steps)
+
+def zoom_map_view(view, steps, anchor):
+    # Keep the map pixel under the anchor (the mouse) in place
+    x, y, zoom = view
+    steps = max(MIN_MAP_ZOOM, min(MAX_MAP_ZOOM, zoom + steps)) - zoom
+    factor = 2.0 ** steps
+    ax, ay = anchor
+    return (int((x + ax) * factor) - ax, int((y + ay) * factor) - ay, zoom + steps)
+
+def render_map_view(pyramid, view, tile_worker, pending_tiles):
+    # Missing detail tiles are drawn upscaled now and generated in the background
+    x, y, zoom = view
+    rgb, missing = pyramid.render(x, y, WIDTH, HEIGHT, zoom, generate=False)
+    for tile in missing:
+        key = (zoom,) + tile
+        if key not in pending_tiles:
+            pending_tiles[key] = tile_worker.submit(pyramid.detail_tile, zoom, *tile)
+            pending_tiles[key].add_done_callback(lambda _: notify(TILE_READY))
+    return make_surface(rgb)
+
+def finished_tiles(pending_tiles):
+    done = [key for key, future in pending_tiles.items() if future.done()]
+    for key in done:
+        del pending_tiles[key]
+    return bool(done)
+
+def cancel_tiles(pending_tiles):
+    for future in pending_tiles.values():
+        future.cancel()
+    pending_tiles.clear()
+
+def recolor(regenerator, params, editor=None):
+    # A new threshold only reruns the colorize stage on the cached heightmap
+    # (or the edited one); while a generation is still running it just
+    # restarts that instead
+    if editor is not None:
+        editor.set_threshold(params.threshold)
+        return map_surface(editor.rgb)
+    if regenerator.busy:
+        regenerate(regenerator, params, preview=False)
+        return None
+    return map_surface(PIPELINE.rgb(params))
+
+def land_fraction(params, editor):
+    # Brush edits, while there are any, replace the pipeline's map
+    return PIPELINE.land_fraction(params) if editor is None else editor.land_fraction()
+
+def threshold_for_land(params, editor, land):
+    return PIPELINE.threshold_for_land(params, land) if editor is None else editor.threshold_for_land(land)
+
+def show_land(params, editor):
+    pygame.display.set_caption(f"2D Noise Terrain - threshold {params.threshold:.4f}, "
+                               f"{land_fraction(params, editor):.1%} land")
+
+def regenerate(regenerator, params, preview=True):
+    # The timing overlay only shows the latest generation
+    RECORDER.clear()
+    regenerator.start(params, preview)
+
+def draw_timings(window, font, frame_time, cpu_usage):
+    lines = [f"frame {frame_time * 1000:6.1f} ms   cpu {cpu_usage:6.1%}"]
+    for name, (seconds, calls, nbytes) in RECORDER.summary().items():
+        lines.append(f"{name:<18} {seconds * 1000:8.1f} ms  x{calls:<3} {nbytes / 2**20:7.1f} MiB")
+    rects = []
+    for i, line in enumerate(lines):
+        text = font.render(line, True, (255, 255, 255), (0, 0, 0))
+        rects.append(window.blit(text, (8, 8 + i * font.get_linesize())))
+    return rects
+
+def paint(editor, pos, mode, radius):
+    if mode is not None:
+        profiled('brush_stroke', lambda: editor.stroke(*pos, mode, radius))
+
+def draw_edits(window, surface, editor):
+    # Copy the regions recolored by brush strokes into the retained surface
+    # and the window; returns the screen rects for pygame.display.update
+    rects = []
+    for x0, x1, y0, y1 in editor.take_dirty():
+        patch = make_surface(editor.rgb[x0:x1, y0:y1])
+        surface.blit(patch, (x0, y0))
+        rects.append(window.blit(patch, (x0, y0)))
+    return rects
+
+def new_world():
+    return ChunkedWorld(MapParams(WIDTH, HEIGHT, random_seed()))
+
 def main():
     window = init()
-    surface = create_map(WIDTH, HEIGHT)
+    regenerator = Regenerator(PIPELINE, on_update=lambda: notify(REGENERATED))
+    params = random_params(WIDTH, HEIGHT)
+    regenerate(regenerator, params)
+    font = pygame.font.Font(None, 20)
+    clock = pygame.time.Clock()
+    show_timings = False
+    frame_time = 0.0  # Time spent drawing the last frame
+    cpu_usage = 0.0  # Process CPU time over wall time, refreshed every HUD tick
+    cpu_mark = (time.process_time(), time.perf_counter())
+    surface = base_surface = pygame.Surface((WIDTH, HEIGHT))
+    land_keys = {getattr(pygame, f"K_{digit}"): digit / 10 for digit in range(1, 10)}
+    map_view = MAP_ORIGIN  # Top-left pixel and zoom of the island map view
+    pyramid = None  # Zoom levels of the current map, built when first zoomed
+    map_changed = False
+    tile_worker = ThreadPoolExecutor(max_workers=1)
+    pending_tiles = {}
+    world = None  # Infinite world mode when set
+    editor = None  # Brush edits of the current map when set; kept until it is regenerated
+    editing = False  # Brush mode
+    brush_mode = None  # Mode of the mouse button held down in edit mode
+    brush_radius = BRUSH_RADIUS
+    edit_keys = {pygame.K_b, pygame.K_q, pygame.K_F3, pygame.K_t}  # Keys that work in edit mode
+    view = (-WIDTH // 2, -HEIGHT // 2, 0)  # Top-left world pixel and zoom
+    pan_keys = {
+        pygame.K_LEFT: (-PAN_STEP, 0),
+        pygame.K_RIGHT: (PAN_STEP, 0),
+        pygame.K_UP: (0, -PAN_STEP),
+        pygame.K_DOWN: (0, PAN_STEP),
+    }
     running = True
+    dirty = True
     while running:
-        for event in pygame.event.get():
+        # Sleep until something happens; worker threads post events when
+        # their results are ready
+        for event in [pygame.event.wait()] + pygame.event.get():
+            if event.type in REDRAW_EVENTS:
+                dirty = True
             if event.type == pygame.QUIT:
                 running = False
-            if event.type == pygame.KEYDOWN: 
+            if event.type == HUD_TICK:
+                cpu_time, wall_time = time.process_time(), time.perf_counter()
+                cpu_usage = (cpu_time - cpu_mark[0]) / (wall_time - cpu_mark[1])
+                cpu_mark = (cpu_time, wall_time)
+            # Zoomed levels and detail tiles come from the generated map, so the
+            # map can't be zoomed or panned while it has brush edits or is
+            # still being generated
+            map_movable = world is None and editor is None and not regenerator.busy
+            if event.type == pygame.MOUSEWHEEL and map_movable:
+                map_view = zoom_map_view(map_view, event.y, pygame.mouse.get_pos())
+                map_changed = True
+            if event.type == pygame.MOUSEWHEEL and editing:
+                radius = round(brush_radius * BRUSH_SCALE ** event.y)
+                brush_radius = max(MIN_BRUSH_RADIUS, min(MAX_BRUSH_RADIUS, radius))
+            if event.type == pygame.MOUSEBUTTONDOWN and editing:
+                # Left raises (with Shift pushes the coastline out), right lowers
+                if event.button == 1:
+                    brush_mode = 'coast' if pygame.key.get_mods() & pygame.KMOD_SHIFT else 'raise'
+                if event.button == 3:
+                    brush_mode = 'lower'
+                paint(editor, event.pos, brush_mode, brush_radius)
+            if event.type == pygame.MOUSEBUTTONUP:
+                brush_mode = None
+            if event.type == pygame.MOUSEMOTION and editing:
+                paint(editor, event.pos, brush_mode, brush_radius)
+            if event.type == pygame.KEYDOWN and (not editing or event.key in edit_keys):
                 if event.key == pygame.K_q:
                     running = False
+                if event.key == pygame.K_b and editing:
+                    # Leave edit mode; the edits stay until the next regeneration
+                    editing, brush_mode = False, None
+                    base_surface = surface
+                    if not editor.edited:
+                        editor = None
+                    pygame.event.set_blocked(pygame.MOUSEMOTION)
+                elif event.key == pygame.K_b and world is None and map_view == MAP_ORIGIN and not regenerator.busy:
+                    if editor is None:
+                        editor = TerrainEditor(PIPELINE.heightmap(params), params.threshold)
+                    editing = True
+                    surface = base_surface = make_surface(editor.rgb)
+                    pygame.event.set_allowed(pygame.MOUSEMOTION)
                 if event.key == pygame.K_r:
-                    surface = create_map(WIDTH, HEIGHT)
+                    if world is None:
+                        params = replace(random_params(WIDTH, HEIGHT), erosion_iterations=params.erosion_iterations)
+                        regenerate(regenerator, params)
+                        map_view, pyramid, map_changed = MAP_ORIGIN, None, True
+                        cancel_tiles(pending_tiles)
+                        editor = None
+                    else:
+                        world = new_world()
+                        surface = create_world_view(world, view)
+                if event.key == pygame.K_w:
+                    if world is None:
+                        # The map is regenerated on the way back
+                        world, editor = new_world(), None
+                        surface = create_world_view(world, view)
+                    else:
+                        world = None
+                        regenerate(regenerator, params, preview=False)
+                        map_changed = True
+                if world is None and event.key in (pygame.K_COMMA, pygame.K_PERIOD):
+                    step = THRESHOLD_STEP if event.key == pygame.K_PERIOD else -THRESHOLD_STEP
+                    params = replace(params, threshold=round(min(1.0, max(0.0, params.threshold + step)), 4))
+                    base_surface = recolor(regenerator, params, editor) or base_surface
+                    pyramid, map_changed = None, True
+                    cancel_tiles(pending_tiles)
+                if world is None and not regenerator.busy and (
+                        event.key in land_keys or event.key in (pygame.K_SEMICOLON, pygame.K_QUOTE)):
+                    # Retarget the threshold to a land fraction through the height histogram
+                    if event.key in land_keys:
+                        land = land_keys[event.key]
+                    else:
+                        step = LAND_STEP if event.key == pygame.K_QUOTE else -LAND_STEP
+                        land = land_fraction(params, editor) + step
+                    params = replace(params, threshold=threshold_for_land(params, editor, land))
+                    base_surface = recolor(regenerator, params, editor) or base_surface
+                    pyramid, map_changed = None, True
+                    cancel_tiles(pending_tiles)
+                    show_land(params, editor)
+                if world is None and event.key in (pygame.K_LEFTBRACKET, pygame.K_RIGHTBRACKET):
+                    step = FALLOFF_STEP if event.key == pygame.K_RIGHTBRACKET else -FALLOFF_STEP
+                    falloff = min(1.0, max(params.plateau_radius + FALLOFF_STEP, params.falloff_radius + step))
+                    params = replace(params, falloff_radius=round(falloff, 4))
+                    regenerate(regenerator, params, preview=False)
+                    pyramid, map_changed = None, True
+                    cancel_tiles(pending_tiles)
+                    editor = None
+                if world is None and event.key == pygame.K_e:
+                    erosion = 0 if params.erosion_iterations else EROSION_ITERATIONS
+                    params = replace(params, erosion_iterations=erosion)
+                    regenerate(regenerator, params, preview=False)
+                    pyramid, map_changed = None, True
+                    cancel_tiles(pending_tiles)
+                    editor = None
+                if event.key == pygame.K_F3:
+                    show_timings = not show_timings
+                    pygame.time.set_timer(HUD_TICK, 1000 if show_timings else 0)
+                if event.key == pygame.K_t:
+                    RECORDER.write_chrome_trace(TRACE_PATH)
+                    print(f"Wrote {TRACE_PATH}")
+                if world is not None and event.key in pan_keys:
+                    view = pan_world_view(world, surface, view, *pan_keys[event.key])
+                if map_movable and event.key in pan_keys:
+                    dx, dy = pan_keys[event.key]
+                    map_view = (map_view[0] + dx, map_view[1] + dy, map_view[2])
+                    map_changed = True
+                if world is not None and event.key in (pygame.K_EQUALS, pygame.K_MINUS):
+                    view = zoom_world_view(view, 1 if event.key == pygame.K_EQUALS else -1)
+                    surface = create_world_view(world, view)
+
+        # Pick up the latest pass of a background regeneration
+        result = regenerator.poll()
+        if result is not None:
+            base_surface = map_surface(result[2])
+            map_changed = True
+        # A new pyramid needs the full-resolution heightmap; until the
+        # regenerator has it, building one would compute it on this thread
+        map_ready = not regenerator.busy or (result is not None and result[:2] == (params, 1))
+        if world is None and map_view != MAP_ORIGIN:
+            if (pyramid is not None or map_ready) and (finished_tiles(pending_tiles) or map_changed):
+                if pyramid is None:
+                    pyramid = MapPyramid(params, PIPELINE)
+                surface = render_map_view(pyramid, map_view, tile_worker, pending_tiles)
+        elif world is None and map_changed:
+            surface = base_surface
+        map_changed = False
 
+        if not dirty:
+            # Brush strokes only update the rectangles they recolored
+            if editor is None or not editor.dirty:
+                continue
+            start = time.perf_counter()
+            rects = draw_edits(window, surface, editor)
+            if show_timings:
+                rects += draw_timings(window, font, frame_time, cpu_usage)
+            pygame.display.update(rects)
+            frame_time = time.perf_counter() - start
+            clock.tick(MAX_FPS)
+            continue
+        if editor is not None:
+            draw_edits(window, surface, editor)
+        start = time.perf_counter()
         window.blit(surface, (0, 0))
+        if show_timings:
+            draw_timings(window, font, frame_time, cpu_usage)
         pygame.display.flip()
+        frame_time = time.perf_counter() - start
+        dirty = False
+        clock.tick(MAX_FPS)
+    tile_worker.shutdown(cancel_futures=True)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,36 @@
+import importlib
+
+from .cache import LRUCache
+from .colorize import colorize, compile_palette, get_color, get_flat_color, shade_color
+from .compact import HEIGHTMAP_TOLERANCE, dequantize_heightmap, generate_heightmap_compact, quantize_heightmap
+from .editor import TerrainEditor
+from .erosion import erode
+from .mapfile import HeightmapFile, generate_heightmap_file, write_heightmap_file
+from .octaves import NoiseSlice3, OctaveCache, SimplexField2
+from .outofcore import generate_heightmap_to_file
+from .perlin import pnoise3
+from .pipeline import MapPipeline
+from .profiling import LoggingSink, Recorder, add_sink, profiled, remove_sink, stage
+from .progressive import Regenerator
+from .pyramid import MapPyramid
+from .simplex import (MAX_SEED, SNOISE2_TOLERANCE, FieldSpec, generate_noise, noise2, noise3, permutation_table,
+                      sample_fields, seed_table, snoise2, snoise3)
+from .sweep import map_statistics, sweep_seeds
+from .terrain import (MapParams, add_noise, bands, downsampled, generate_heightmap, generate_radial_gradient,
+                      random_seed)
+from .world import CHUNK_SIZE, ChunkedWorld, generate_chunk
+
+# The core only needs NumPy. Modules that pull in multiprocessing or asyncio
+# are imported on first use, and pygame only by procgen.viewer, so worker
+# processes and the CLI start quickly (see `python -m procgen bench --imports`).
+_LAZY = {
+    'erode_parallel': 'parallel',
+    'generate_heightmap_parallel': 'parallel',
+    'TileServer': 'tileserver',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        return getattr(importlib.import_module('.' + _LAZY[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
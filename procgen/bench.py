@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from .colorize import colorize
+from .compact import generate_heightmap_compact
+from .editor import TerrainEditor
+from .erosion import erode
+from .pipeline import MapPipeline
+from .simplex import FieldSpec, generate_noise, sample_fields
+from .terrain import MapParams, add_noise, generate_heightmap, generate_radial_gradient
+
+# Benchmarks for every stage of the pipeline and for the end-to-end map.
+# Each (stage, size) reports the best wall time over a few repeats, pixels/sec
+# and the tracemalloc peak of one extra run. Results are written as JSON and
+# can be compared against a stored baseline. Golden checksums pin the exact
+# output, so a speedup can't silently change the maps.
+
+DEFAULT_SIZES = (256, 1024, 4096, 8192)
+REGRESSION_TOLERANCE = 1.25  # Slower than baseline by more than this fails
+EROSION_ITERATIONS = 10  # Per erosion run; divide by this for the cost of one iteration
+IMPORT_MODULES = ('numpy', 'procgen', 'procgen.cli', 'procgen.viewer')
+
+GOLDEN_PARAMS = {
+    'island-256x192-seed42': MapParams(width=256, height=192, seed=42),
+    'island-800x600-seed7': MapParams(width=800, height=600, seed=7),
+}
+
+# sha256 of the float64 heightmap and the uint8 RGB map for GOLDEN_PARAMS,
+# recorded from the original per-pixel noise.snoise2/get_color implementation
+GOLDEN_CHECKSUMS = {
+    'island-256x192-seed42': {
+        'heightmap': '3078bcbd89c8b2cfbf473d2323b1628bec451960b930ab9d5841cb82aae4bac6',
+        'rgb': '27ce9aff24fe0e7f5dc5e7ef7db6bf4e64ef8f0ff172a2ec29e1940651af10d5',
+    },
+    'island-800x600-seed7': {
+        'heightmap': '5a6a360dca89f3cc86755b191b802b910d6ba3e378f2774849b00bdada715646',
+        'rgb': 'c32266fc479cc9cd2c6212ef54f7c2085c8f4bb011c10fc207ae5359bcc6c5dd',
+    },
+}
+
+
+def checksum(array):
+    return hashlib.sha256(np.ascontiguousarray(array).tobytes()).hexdigest()
+
+
+def golden_checksums():
+    checksums = {}
+    for name, params in GOLDEN_PARAMS.items():
+        heightmap = generate_heightmap(params)
+        checksums[name] = {
+            'heightmap': checksum(heightmap),
+            'rgb': checksum(colorize(heightmap, params.threshold)),
+        }
+    return checksums
+
+
+def check_golden():
+    # Names of the golden outputs whose checksums no longer match
+    actual = golden_checksums()
+    return sorted(name for name, sums in GOLDEN_CHECKSUMS.items() if actual[name] != sums)
+
+
+def _surface_maker():
+    # Only the surface stages need pygame; they import it in their setup so the
+    # import never lands in the timed region
+    import pygame
+    return pygame.surfarray.make_surface
+
+
+def _erode_parallel():
+    # procgen.parallel imports multiprocessing, which the rest of the bench
+    # doesn't need
+    from .parallel import erode_parallel
+    return erode_parallel
+
+
+def stages(size, seed=0):
+    # name -> (setup, run); setup builds the inputs outside the timed region
+    params = MapParams(width=size, height=size, seed=seed)
+
+    def inputs():
+        heightmap = generate_heightmap(params)
+        return {
+            'gradient': generate_radial_gradient(size, size),
+            'heightmap': heightmap,
+            'heightmap_float32': heightmap.astype(np.float32),
+            'rgb': colorize(heightmap, params.threshold),
+        }
+
+    return {
+        'generate_noise': (None, lambda _: generate_noise(size, size, params.scale, params.octaves, seed)),
+        # Elevation, moisture and temperature in one pass
+        'sample_fields': (None, lambda _: sample_fields([FieldSpec(params.scale, params.octaves, seed),
+                                                         FieldSpec(params.noise_scale, params.noise_octaves, seed),
+                                                         FieldSpec(params.scale * 4, 2, seed + 1)], size, size)),
+        'generate_radial_gradient': (None, lambda _: generate_radial_gradient(size, size)),
+        'add_noise': (inputs, lambda data: add_noise(size, size, data['gradient'], params.noise_scale, seed)),
+        'generate_heightmap': (None, lambda _: generate_heightmap(params)),
+        'generate_heightmap_float32': (None, lambda _: generate_heightmap_compact(params, np.float32)),
+        'generate_heightmap_uint16': (None, lambda _: generate_heightmap_compact(params, np.uint16)),
+        'erode': (inputs, lambda data: erode(data['heightmap_float32'], EROSION_ITERATIONS)),
+        'erode_parallel': (lambda: dict(inputs(), erode_parallel=_erode_parallel()),
+                           lambda data: data['erode_parallel'](data['heightmap_float32'], EROSION_ITERATIONS)),
+        'colorize': (inputs, lambda data: colorize(data['heightmap'], params.threshold)),
+        # One brush dab; its time should not grow with the map size
+        'brush_stroke': (lambda: TerrainEditor(generate_heightmap(params), params.threshold),
+                         lambda editor: editor.stroke(size // 2, size // 2)),
+        'make_surface': (lambda: dict(inputs(), make_surface=_surface_maker()),
+                         lambda data: data['make_surface'](data['rgb'])),
+        'create_map': (_surface_maker, lambda make_surface: make_surface(MapPipeline().rgb(params))),
+    }
+
+
+def measure(setup, run, repeat=3):
+    data = setup() if setup is not None else None
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(data)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        run(data)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, names=None, repeat=3, log=print):
+    results = []
+    for size in sizes:
+        for name, (setup, run) in stages(size).items():
+            if names and name not in names:
+                continue
+            seconds, peak = measure(setup, run, repeat)
+            result = {
+                'stage': name,
+                'size': size,
+                'pixels': size * size,
+                'seconds': seconds,
+                'pixels_per_sec': size * size / seconds if seconds else float('inf'),
+                'peak_bytes': peak,
+            }
+            results.append(result)
+            if log:
+                log(f"{name:>26} {size:>5}²  {seconds * 1000:10.1f} ms  "
+                    f"{result['pixels_per_sec'] / 1e6:8.2f} Mpx/s  {peak / 2**20:9.1f} MiB peak")
+    return results
+
+
+def cold_import_seconds(module, repeat=5):
+    # Best time of `import module` in a fresh interpreter
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    return min(float(subprocess.run([sys.executable, '-c', code], cwd=root, env=env, check=True,
+                                    capture_output=True, text=True).stdout)
+               for _ in range(repeat))
+
+
+def import_benchmarks(modules=IMPORT_MODULES, repeat=5, log=print):
+    results = {}
+    for module in modules:
+        results[module] = cold_import_seconds(module, repeat)
+        if log:
+            log(f"{'import ' + module:>26}        {results[module] * 1000:10.1f} ms")
+    return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    # (stage, size, ratio) for every result slower than tolerance x baseline,
+    # with ratio None for results the baseline has no entry for
+    reference = {(r['stage'], r['size']): r['seconds'] for r in baseline['results']}
+    regressions = []
+    for result in results:
+        before = reference.get((result['stage'], result['size']))
+        if not before:
+            regressions.append((result['stage'], result['size'], None))
+            continue
+        ratio = result['seconds'] / before
+        if ratio > tolerance:
+            regressions.append((result['stage'], result['size'], ratio))
+    return regressions
+
+
+def save(path, results, golden_failures, imports=None):
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'results': results,
+                   'golden_failures': golden_failures, 'imports': imports}, f, indent=2)
+        f.write('\n')
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
@@ -0,0 +1,67 @@
+import threading
+from collections import OrderedDict
+
+
+def nbytes_of(value):
+    # Size of an array, or of a tuple/list of arrays
+    if isinstance(value, (tuple, list)):
+        return sum(nbytes_of(item) for item in value)
+    return getattr(value, 'nbytes', 0)
+
+
+class LRUCache:
+    # Least-recently-used cache bounded by the total byte size of its values
+    # rather than by entry count. Safe to share between threads.
+
+    def __init__(self, max_bytes, sizeof=nbytes_of):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._sizeof = sizeof
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self._sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            if size > self.max_bytes:
+                return value
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            self.nbytes -= entry[1]
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from . import bench
+from .colorize import colorize
+from .compact import generate_heightmap_compact
+from .mapfile import HeightmapFile, write_heightmap_file
+from .profiling import Recorder, add_sink, profiled, remove_sink
+from .png import write_png
+from .sweep import sweep_seeds
+from .terrain import MapParams, generate_heightmap, random_seed
+
+
+def parse_seeds(values):
+    # Seeds may be given as "7", "1,2,3" or inclusive ranges like "0-99"
+    seeds = []
+    for value in values:
+        for part in value.split(','):
+            if not part:
+                continue
+            first, sep, last = part.partition('-')
+            if sep:
+                seeds.extend(range(int(first), int(last) + 1))
+            else:
+                seeds.append(int(part))
+    return seeds
+
+
+def add_map_arguments(parser):
+    defaults = MapParams()
+    parser.add_argument('--width', type=int, default=defaults.width)
+    parser.add_argument('--height', type=int, default=defaults.height)
+    parser.add_argument('--scale', type=float, default=defaults.scale)
+    parser.add_argument('--octaves', type=int, default=defaults.octaves)
+    parser.add_argument('--noise-scale', type=float, default=defaults.noise_scale)
+    parser.add_argument('--threshold', type=float, default=defaults.threshold)
+    parser.add_argument('--erosion', type=int, default=defaults.erosion_iterations, metavar='ITERATIONS',
+                        help="erosion iterations over each heightmap (default: none)")
+    parser.add_argument('--seed', nargs='+', default=None,
+                        help="seeds to generate, e.g. '7', '1,2,3' or '0-99' (default: one random seed)")
+
+
+def map_params(args, seed):
+    return MapParams(width=args.width, height=args.height, seed=seed, scale=args.scale,
+                     octaves=args.octaves, noise_scale=args.noise_scale, threshold=args.threshold,
+                     erosion_iterations=args.erosion)
+
+
+def seeds_from(args):
+    if args.seed is None:
+        return [random_seed()]
+    return parse_seeds(args.seed)
+
+
+def render(args):
+    recorder = add_sink(Recorder()) if args.trace else None
+    try:
+        render_seeds(args)
+    finally:
+        if recorder is not None:
+            remove_sink(recorder)
+            recorder.write_chrome_trace(args.trace)
+    return 0
+
+
+def render_seeds(args):
+    os.makedirs(args.output_dir, exist_ok=True)
+    for seed in seeds_from(args):
+        params = map_params(args, seed)
+        if args.precision != 'float64':
+            heightmap = generate_heightmap_compact(params, args.precision)
+        elif args.workers == 1:
+            heightmap = generate_heightmap(params)
+        else:
+            from .parallel import generate_heightmap_parallel  # Imports multiprocessing
+            heightmap = generate_heightmap_parallel(params, workers=args.workers)
+        stem = os.path.join(args.output_dir, f"map-{seed}")
+        if args.format in ('npy', 'both'):
+            np.save(stem + '.npy', heightmap)
+            print(stem + '.npy')
+        if args.format == 'hmap':
+            profiled('write_hmap', lambda: write_heightmap_file(stem + '.hmap', heightmap, params))
+            print(stem + '.hmap')
+        if args.format in ('png', 'both'):
+            rgb = profiled('colorize', lambda: colorize(heightmap, params.threshold))
+            profiled('write_png', lambda: write_png(stem + '.png', rgb))
+            print(stem + '.png')
+
+
+def verify(args):
+    status = 0
+    for path in args.files:
+        with HeightmapFile(path) as f:
+            bad = f.verify()
+        if bad:
+            print(f"{path}: {len(bad)} chunks differ from seed {f.params.seed}: {bad}")
+            status = 1
+        else:
+            print(f"{path}: ok")
+    return status
+
+
+def serve(args):
+    from .tileserver import serve as serve_tiles  # Imports asyncio
+    params = MapParams(scale=args.scale, octaves=args.octaves, noise_scale=args.noise_scale, threshold=args.threshold)
+    print(f"Serving http://{args.host}:{args.port}/{{seed}}/{{z}}/{{x}}/{{y}}.png")
+    try:
+        serve_tiles(args.host, args.port, params=params, cache_dir=args.cache_dir or None, workers=args.workers)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def sweep(args):
+    results = sweep_seeds(seeds_from(args), map_params(args, 0), args.workers, args.downsample)
+    for stats in results:
+        if not args.min_land <= stats['land_fraction'] <= args.max_land:
+            continue
+        print(json.dumps(stats))
+    return 0
+
+
+def benchmark(args):
+    golden_failures = bench.check_golden()
+    for name in golden_failures:
+        print(f"golden output changed: {name}")
+    results = bench.run_benchmarks(args.sizes, args.stage, args.repeat)
+    imports = bench.import_benchmarks(repeat=args.repeat) if args.imports else None
+    if args.output:
+        bench.save(args.output, results, golden_failures, imports)
+    status = 1 if golden_failures else 0
+    if args.baseline:
+        regressions = bench.compare(results, bench.load(args.baseline), args.tolerance)
+        for stage, size, ratio in regressions:
+            if ratio is None:
+                print(f"missing baseline: {stage} at {size}² is not in {args.baseline}")
+            else:
+                print(f"regression: {stage} at {size}² is {ratio:.2f}x slower than the baseline")
+        if regressions:
+            status = 1
+    return status
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m procgen')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    render_parser = commands.add_parser('render', help="render maps to PNG, .npy or .hmap without a window")
+    add_map_arguments(render_parser)
+    render_parser.add_argument('--format', choices=('png', 'npy', 'hmap', 'both'), default='png',
+                               help="'both' is png and npy; hmap is the chunked, compressed heightmap file")
+    render_parser.add_argument('--output-dir', '-o', default='.')
+    render_parser.add_argument('--workers', type=int, default=1,
+                               help="processes per map; 0 uses every core")
+    render_parser.add_argument('--precision', choices=('float64', 'float32', 'uint16'), default='float64',
+                               help="heightmap storage; float32/uint16 use a single process and less memory")
+    render_parser.add_argument('--trace', help="write per-stage timings to this Chrome trace-event JSON file")
+    render_parser.set_defaults(func=render)
+
+    verify_parser = commands.add_parser('verify', help="regenerate .hmap files from their headers and compare")
+    verify_parser.add_argument('files', nargs='+')
+    verify_parser.set_defaults(func=verify)
+
+    defaults = MapParams()
+    serve_parser = commands.add_parser('serve', help="serve infinite-world XYZ tiles over HTTP")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8000)
+    serve_parser.add_argument('--cache-dir', default='tiles', help="on-disk tile cache; '' disables it")
+    serve_parser.add_argument('--workers', type=int, default=0,
+                              help="processes generating tiles; 0 uses every core")
+    serve_parser.add_argument('--scale', type=float, default=defaults.scale)
+    serve_parser.add_argument('--octaves', type=int, default=defaults.octaves)
+    serve_parser.add_argument('--noise-scale', type=float, default=defaults.noise_scale)
+    serve_parser.add_argument('--threshold', type=float, default=defaults.threshold)
+    serve_parser.set_defaults(func=serve)
+
+    sweep_parser = commands.add_parser('sweep', help="print land/water statistics for many seeds as JSON lines")
+    add_map_arguments(sweep_parser)
+    sweep_parser.add_argument('--workers', type=int, default=0,
+                              help="processes in the pool; 0 uses every core")
+    sweep_parser.add_argument('--downsample', type=int, default=1,
+                              help="generate at 1/N resolution for a faster, approximate screen")
+    sweep_parser.add_argument('--min-land', type=float, default=0.0)
+    sweep_parser.add_argument('--max-land', type=float, default=1.0)
+    sweep_parser.set_defaults(func=sweep)
+
+    bench_parser = commands.add_parser('bench', help="benchmark every pipeline stage and check golden outputs")
+    bench_parser.add_argument('--sizes', type=int, nargs='+', default=bench.DEFAULT_SIZES,
+                              help="map sizes (pixels per side)")
+    bench_parser.add_argument('--stage', nargs='+', help="only run these stages")
+    bench_parser.add_argument('--repeat', type=int, default=3)
+    bench_parser.add_argument('--output', '-o', help="write the results to this JSON file")
+    bench_parser.add_argument('--baseline', help="fail if slower than this results file")
+    bench_parser.add_argument('--tolerance', type=float, default=bench.REGRESSION_TOLERANCE)
+    bench_parser.add_argument('--imports', action='store_true',
+                              help="also time cold imports of the package in fresh interpreters")
+    bench_parser.set_defaults(func=benchmark)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+import math
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+
+from .colors import BLUE, BROWN, GREEN, SAND, WHITE
+
+
+def shade_color(color: Tuple[int, int, int], min: float, max: float, value: float) -> Tuple[int, int, int]:
+    if max == 0:
+        return color
+    if value < 0:
+        return (0,0,0)
+    multiplier = float(1 - (((max - value) / max) * .75))
+    bright = tuple(int(element * multiplier) for element in color)
+    return bright
+
+
+def shaded_bands(threshold):
+    # (color, bottom, top) of each biome band, from deep water up to snow caps
+    bottom = 0
+    sea = threshold
+    beach = threshold + 0.05
+    grass = threshold + 0.18
+    hills = threshold + 0.28
+    snow = 1
+    return [
+        (BLUE, bottom, sea),  # Deep Water
+        (SAND, sea, beach),  # Beach
+        (GREEN, beach, grass),  # Grass
+        (BROWN, grass, hills),  # Hills
+        (WHITE, hills, snow),  # Snow caps
+    ]
+
+
+def flat_bands(threshold):
+    # (color, top) of each band in the unshaded style of 03-more-noise.py
+    return [
+        (BLUE, threshold - 0.05),  # Deep Water
+        (SAND, threshold),  # Beach
+        (GREEN, threshold + 0.22),  # Grass
+        (BROWN, threshold + 0.30),  # Hills
+        (WHITE, math.inf),  # Snow caps
+    ]
+
+
+def get_color(value, threshold=0.15):
+    bands = shaded_bands(threshold)
+    for color, bottom, top in bands[:-1]:
+        if value < top:
+            return shade_color(color, bottom, top, value)
+    color, bottom, top = bands[-1]
+    return shade_color(color, bottom, top, value)
+
+
+def get_flat_color(value, threshold=0.15):
+    for color, top in flat_bands(threshold):
+        if value < top:
+            return color
+    return WHITE
+
+
+def _first_value_reaching(level, channel, color, bottom, top, guess):
+    # Smallest float >= guess-ish at which the shaded channel reaches `level`.
+    # The analytic guess is only off by a few ulps, so walk to the exact edge.
+    def shade(v):
+        return shade_color(color, bottom, top, v)[channel]
+
+    v = guess
+    if shade(v) >= level:
+        below = math.nextafter(v, -math.inf)
+        while shade(below) >= level:
+            v, below = below, math.nextafter(below, -math.inf)
+    else:
+        v = math.nextafter(v, math.inf)
+        while shade(v) < level:
+            v = math.nextafter(v, math.inf)
+    return v
+
+
+def _shaded_edges(threshold):
+    edges = {0.0}  # shade_color turns every negative value black
+    bands = shaded_bands(threshold)
+    for n, (color, bottom, top) in enumerate(bands):
+        edges.add(float(bottom))
+        if top <= 0:
+            continue
+        # The snow band has no upper bound; its top only scales the shading
+        ceiling = top if n < len(bands) - 1 else math.inf
+        # Within a band int(element * multiplier) is a non-decreasing step
+        # function of the value; record where each channel steps up.
+        for channel, element in enumerate(color):
+            for level in range(1, element + 1):
+                guess = max(top * (1 - (1 - level / element) / .75), 0.0)
+                if not bottom - 1e-9 < guess < ceiling + 1e-9:
+                    continue
+                edge = _first_value_reaching(level, channel, color, bottom, top, guess)
+                if bottom < edge < ceiling:
+                    edges.add(edge)
+    return edges
+
+
+@lru_cache(maxsize=32)
+def compile_palette(threshold, shaded=True):
+    # Compile the biome bands into sorted value edges plus a palette LUT:
+    # heights in [edges[i - 1], edges[i]) map to palette[i]. Every palette
+    # entry comes from get_color itself, so the LUT is byte-identical to it.
+    if shaded:
+        edges = _shaded_edges(threshold)
+        reference = get_color
+    else:
+        edges = {float(top) for _, top in flat_bands(threshold)[:-1]}
+        reference = get_flat_color
+    # Heights are in [0, 1]; a band starting above 1 is never reached, and
+    # get_color would shade its bottom past 255
+    edges = np.array(sorted(edge for edge in edges if edge <= 1), dtype=np.float64)
+    palette = np.empty((len(edges) + 1, 3), dtype=np.uint8)
+    palette[0] = reference(math.nextafter(edges[0], -math.inf), threshold)
+    for i, edge in enumerate(edges):
+        palette[i + 1] = reference(edge, threshold)
+    edges.setflags(write=False)
+    palette.setflags(write=False)
+    return edges, palette
+
+
+@lru_cache(maxsize=32)
+def _level_indices(threshold, shaded=True):
+    # Palette index of every level of a uint16 heightmap
+    levels = np.arange(65536, dtype=np.float64) / 65535
+    indices = np.searchsorted(compile_palette(threshold, shaded)[0], levels, side='right').astype(np.uint16)
+    indices.setflags(write=False)
+    return indices
+
+
+def quantize(height_map, threshold=0.15, shaded=True):
+    # Palette index of every height; a uint16 map that colorize_indices can
+    # turn into RGB in one gather. uint16 heightmaps (heights scaled to
+    # 0..65535) go through a per-level table instead of a search.
+    if height_map.dtype == np.uint16:
+        return _level_indices(float(threshold), shaded)[height_map]
+    edges, _ = compile_palette(float(threshold), shaded)
+    return np.searchsorted(edges, height_map, side='right').astype(np.uint16)
+
+
+def colorize_indices(indices, threshold=0.15, shaded=True):
+    _, palette = compile_palette(float(threshold), shaded)
+    return palette[indices]
+
+
+def colorize(height_map, threshold=0.15, shaded=True):
+    # Vectorized get_color over a whole heightmap: (..., 3) uint8 RGB
+    return colorize_indices(quantize(height_map, threshold, shaded), threshold, shaded)
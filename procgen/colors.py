@@ -0,0 +1,7 @@
+# Define colors
+BLACK = (0,0,0)
+GREEN = (34, 139, 34)
+SAND = (231,196,150)
+BROWN = (139,69,19)
+BLUE = (0, 0, 255)
+WHITE = (255, 255, 255)
@@ -0,0 +1,103 @@
+import numpy as np
+
+from .erosion import erode
+from .profiling import profiled
+from .simplex import generate_noise
+from .terrain import bands
+
+# generate_heightmap in float32 (or quantized to uint16) with in-place steps.
+# The map is built in one output buffer: each band of the gradient is written
+# straight into it and multiplied by a band of detail noise, the global range
+# is normalized in place, and a second pass multiplies in the base noise band
+# by band. Peak memory is the output plus one band of noise temporaries,
+# instead of several full-size float64 arrays.
+#
+# The noise is float32 in every pipeline, so the float32 result differs from
+# the float64 reference only by float32 rounding of the gradient and the
+# combine steps; uint16 storage adds half a level (1 / 131070).
+
+UINT16_MAX = 65535
+
+# Largest absolute difference from terrain.generate_heightmap, for heights in
+# [0, 1]. Colors only change for pixels within this distance of a band edge.
+HEIGHTMAP_TOLERANCE = {
+    np.dtype(np.float64): 1e-6,
+    np.dtype(np.float32): 1e-6,
+    np.dtype(np.uint16): 1e-5,
+}
+
+
+def radial_gradient_into(out, width, height, plateau_radius=0.2, falloff_radius=0.7, x0=0, y0=0):
+    # generate_radial_gradient for the (x0, y0) corner of out, written in place:
+    # the cosine falloff is evaluated on the clipped distance, so the plateau
+    # and the outside come out as 1 and (after the mask) 0 without np.piecewise
+    x = np.linspace(-1, 1, width)
+    y = np.linspace(-1, 1, height)
+    max_distance = np.sqrt(np.max(x**2) + np.max(y**2))
+    x = x[x0:x0 + out.shape[0], None].astype(out.dtype)
+    y = y[None, y0:y0 + out.shape[1]].astype(out.dtype)
+    np.hypot(x, y, out=out)
+    out /= max_distance
+    outside = out > falloff_radius
+    if falloff_radius > plateau_radius:
+        out -= plateau_radius
+        np.clip(out, 0, falloff_radius - plateau_radius, out=out)
+        out *= np.pi
+        out /= falloff_radius - plateau_radius
+        np.cos(out, out=out)
+        out += 1
+        out *= 0.5
+    else:
+        out[...] = 1
+    out[outside] = 0
+    return out
+
+
+def quantize_heightmap(heightmap):
+    # Heights in [0, 1] to uint16 levels; overwrites a float heightmap
+    np.clip(heightmap, 0, 1, out=heightmap)
+    heightmap *= UINT16_MAX
+    np.rint(heightmap, out=heightmap)
+    return heightmap.astype(np.uint16)
+
+
+def dequantize_heightmap(levels, dtype=np.float32):
+    heightmap = levels.astype(dtype)
+    heightmap /= UINT16_MAX
+    return heightmap
+
+
+def _fill(params, heightmap, band_size):
+    for x0, x1, y0, y1 in bands(params.width, params.height, band_size):
+        band = heightmap[x0:x1]
+        radial_gradient_into(band, params.width, params.height,
+                             params.plateau_radius, params.falloff_radius, x0, y0)
+        band *= generate_noise(x1 - x0, y1 - y0, params.noise_scale, params.noise_octaves,
+                               params.seed, x0, y0, dtype=heightmap.dtype)
+
+
+def _finish(params, heightmap, band_size):
+    # Normalize the combined gradient with the whole map's range
+    low, high = heightmap.min(), heightmap.max()
+    heightmap -= low
+    heightmap /= high - low
+    # Multiply the noise map by the combined gradient
+    for x0, x1, y0, y1 in bands(params.width, params.height, band_size):
+        heightmap[x0:x1] *= generate_noise(x1 - x0, y1 - y0, params.scale, params.octaves,
+                                           params.seed, x0, y0, dtype=heightmap.dtype)
+
+
+def generate_heightmap_compact(params, dtype=np.float32, band_size=64, out=None):
+    # dtype is float32, float64 or uint16 (computed in float32, then quantized).
+    # out, if given, is a float buffer of the map's shape to build the map in.
+    dtype = np.dtype(dtype)
+    work_dtype = np.float32 if dtype == np.uint16 else dtype
+    heightmap = out if out is not None else np.empty((params.width, params.height), dtype=work_dtype)
+    profiled('noisy_gradient', lambda: _fill(params, heightmap, band_size))
+    profiled('finish_heightmap', lambda: _finish(params, heightmap, band_size))
+    if params.erosion_iterations:
+        # Erosion works on whole-map copies, so it is not compact
+        heightmap[...] = profiled('erosion', lambda: erode(heightmap, params.erosion_iterations))
+    if dtype == np.uint16:
+        return profiled('quantize_heightmap', lambda: quantize_heightmap(heightmap))
+    return heightmap
@@ -0,0 +1,95 @@
+import numpy as np
+
+from .colorize import colorize
+from .compact import dequantize_heightmap
+from .sweep import cumulative_histogram, land_fraction_at, threshold_for_land_fraction
+
+# Brush editing of a retained heightmap. A stroke changes only the pixels under
+# the brush, and colorize is per pixel, so only that rectangle is recolored
+# into the retained RGB map: a stroke costs the same on a map of any size.
+# Changed (x0, x1, y0, y1) regions collect in `dirty` until the viewer takes
+# them to redraw just those parts of the screen. The edited map can be
+# recolored and land-targeted like a MapPipeline map.
+
+BRUSH_RADIUS = 24
+MIN_BRUSH_RADIUS, MAX_BRUSH_RADIUS = 4, 256
+BRUSH_STRENGTH = 0.01  # Height change under the brush center per stroke
+COAST_MARGIN = 0.01  # The coast brush raises water to this far above the threshold
+BRUSH_MODES = ('raise', 'lower', 'coast')
+
+
+class TerrainEditor:
+
+    def __init__(self, heightmap, threshold, shaded=True):
+        if heightmap.dtype == np.uint16:
+            heightmap = dequantize_heightmap(heightmap)
+        self.heightmap = np.array(heightmap, dtype=np.float32)
+        self.threshold = threshold
+        self.shaded = shaded
+        self.rgb = colorize(self.heightmap, threshold, shaded)
+        self.dirty = []
+        self.edited = False  # Whether any stroke has changed the map
+        self._histogram = None
+
+    @property
+    def shape(self):
+        return self.heightmap.shape
+
+    def brush_region(self, x, y, radius):
+        # Pixels a brush at (x, y) can touch, clipped to the map
+        width, height = self.shape
+        return (max(x - radius, 0), min(x + radius + 1, width),
+                max(y - radius, 0), min(y + radius + 1, height))
+
+    def stroke(self, x, y, mode='raise', radius=BRUSH_RADIUS, strength=BRUSH_STRENGTH):
+        # One dab of the brush centered on pixel (x, y); returns the changed
+        # region, or None if the brush is entirely off the map
+        x0, x1, y0, y1 = region = self.brush_region(x, y, radius)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        # Smooth falloff from 1 at the center to 0 at the radius
+        dx = np.arange(x0, x1, dtype=np.float32)[:, None] - x
+        dy = np.arange(y0, y1, dtype=np.float32)[None, :] - y
+        weights = np.clip(1 - (dx * dx + dy * dy) / np.float32(radius * radius), 0, 1)
+        weights *= weights
+        weights *= strength
+        heights = self.heightmap[x0:x1, y0:y1]
+        if mode == 'raise':
+            heights += weights
+        elif mode == 'lower':
+            heights -= weights
+        elif mode == 'coast':
+            # Raise only the water, and only to just above the waterline, so
+            # the coastline moves out without lifting the land behind it
+            coast = np.float32(self.threshold + COAST_MARGIN)
+            np.minimum(heights + weights, np.maximum(heights, coast), out=heights)
+        else:
+            raise ValueError(f"unknown brush mode {mode!r}")
+        np.clip(heights, 0, 1, out=heights)
+        self.rgb[x0:x1, y0:y1] = colorize(heights, self.threshold, self.shaded)
+        self.dirty.append(region)
+        self.edited = True
+        self._histogram = None
+        return region
+
+    def set_threshold(self, threshold):
+        # Recolor the whole edited map
+        self.threshold = threshold
+        self.rgb = colorize(self.heightmap, threshold, self.shaded)
+
+    def histogram(self):
+        # Cumulative height histogram of the edited map, as MapPipeline.histogram
+        if self._histogram is None:
+            self._histogram = cumulative_histogram(self.heightmap)
+        return self._histogram
+
+    def land_fraction(self):
+        return land_fraction_at(self.histogram(), self.threshold)
+
+    def threshold_for_land(self, land_fraction):
+        return threshold_for_land_fraction(self.histogram(), land_fraction)
+
+    def take_dirty(self):
+        # Regions changed since the last call
+        dirty, self.dirty = self.dirty, []
+        return dirty
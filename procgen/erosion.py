@@ -0,0 +1,113 @@
+import numpy as np
+
+# Grid-based erosion, run as whole-array steps instead of per-droplet loops.
+#
+# Hydraulic: every cell gets rain, and water flows to its lower 4-neighbours
+# in proportion to the drop of the water surface. At most a quarter of the
+# total drop moves per step, since a cell can receive from all four sides;
+# more than that makes the water slosh into a checkerboard. Water can carry
+# sediment in proportion to its depth and the slope of the ground under it;
+# below that capacity it picks up soil, above it drops some. Water
+# evaporates, and sediment still suspended at the end is laid down.
+#
+# Thermal: wherever the slope to a neighbour exceeds the talus, part of the
+# excess slides downhill, which smooths the ridges left by the water.
+#
+# Both steps only look at neighbours, and there is no randomness: the result
+# depends only on the heightmap, so a map is reproducible from its seed, and
+# one iteration changes a cell only from cells within REACH of it. A tile
+# run for k iterations with a halo of REACH * k cells is therefore
+# bit-identical to the same cells of the whole map; parallel.erode_parallel
+# runs tiles in rounds of ROUND_ITERATIONS and exchanges halos between rounds,
+# so the halo stays small however many iterations are asked for.
+
+REACH = 4  # Cells one iteration reads in each direction (2 per step)
+ROUND_ITERATIONS = 8  # Iterations between halo exchanges; halo is 32 cells
+
+RAIN = 0.001
+CAPACITY = 50.0  # Sediment carried per unit of water depth and slope
+EROSION_RATE = 0.3
+DEPOSITION_RATE = 0.3
+EVAPORATION = 0.05
+TALUS = 0.004  # Largest stable height difference between neighbours
+THERMAL_RATE = 0.5
+
+
+def _drops(surface, offset=0.0):
+    # Drop from each cell to its +x, -x, +y and -y neighbour (clipped at 0);
+    # cells at the edge of the array have no neighbour on that side
+    drops = np.zeros((4,) + surface.shape, dtype=surface.dtype)
+    np.subtract(surface[:-1], surface[1:], out=drops[0, :-1])
+    np.subtract(surface[1:], surface[:-1], out=drops[1, 1:])
+    np.subtract(surface[:, :-1], surface[:, 1:], out=drops[2, :, :-1])
+    np.subtract(surface[:, 1:], surface[:, :-1], out=drops[3, :, 1:])
+    if offset:
+        drops -= offset
+    np.maximum(drops, 0, out=drops)
+    return drops
+
+
+def _inflow(outflow):
+    # Amount arriving at each cell from the outflows of its neighbours
+    inflow = np.zeros(outflow.shape[1:], dtype=outflow.dtype)
+    inflow[1:] += outflow[0, :-1]
+    inflow[:-1] += outflow[1, 1:]
+    inflow[:, 1:] += outflow[2, :, :-1]
+    inflow[:, :-1] += outflow[3, :, 1:]
+    return inflow
+
+
+def _shares(drops, amount):
+    # Split amount over the four directions in proportion to the drops
+    total = drops.sum(axis=0)
+    np.divide(amount, total, out=total, where=total > 0)
+    drops *= total
+    return drops
+
+
+def hydraulic_step(height, water, sediment, rain=RAIN, capacity=CAPACITY, erosion_rate=EROSION_RATE,
+                   deposition_rate=DEPOSITION_RATE, evaporation=EVAPORATION):
+    water += rain
+    drops = _drops(height + water)
+    moved = np.minimum(water, drops.sum(axis=0) / 4)
+    # Pick up or drop sediment towards the capacity of the water
+    change = capacity * _drops(height).sum(axis=0) * water - sediment
+    change *= np.where(change > 0, erosion_rate, deposition_rate)
+    height -= change
+    sediment += change
+    # Move water, and the same fraction of the sediment, downhill
+    carried = np.divide(sediment, water, out=np.zeros_like(water), where=water > 0)
+    flow = _shares(drops, moved)
+    water -= moved
+    water += _inflow(flow)
+    flow *= carried
+    sediment -= flow.sum(axis=0)
+    sediment += _inflow(flow)
+    water *= 1 - evaporation
+
+
+def thermal_step(height, talus=TALUS, rate=THERMAL_RATE):
+    excess = _drops(height, talus)
+    slide = excess.max(axis=0) * (rate / 2)
+    flow = _shares(excess, slide)
+    height -= slide
+    height += _inflow(flow)
+
+
+def run_iterations(height, water, sediment, iterations, kwargs):
+    # Erode the (height, water, sediment) state in place
+    talus = kwargs.get('talus', TALUS)
+    hydraulic = {name: value for name, value in kwargs.items() if name != 'talus'}
+    for _ in range(iterations):
+        hydraulic_step(height, water, sediment, **hydraulic)
+        thermal_step(height, talus)
+
+
+def erode(heightmap, iterations, **kwargs):
+    # Eroded copy of a heightmap, in its own float dtype
+    height = np.array(heightmap, dtype=np.result_type(heightmap.dtype, np.float32))
+    water = np.zeros_like(height)
+    sediment = np.zeros_like(height)
+    run_iterations(height, water, sediment, iterations, kwargs)
+    height += sediment
+    return height
@@ -0,0 +1,153 @@
+import json
+import mmap
+import struct
+import zlib
+from dataclasses import asdict
+
+import numpy as np
+
+from .cache import LRUCache
+from .compact import dequantize_heightmap, generate_heightmap_compact, quantize_heightmap
+from .terrain import MapParams
+
+# Chunked heightmap container (.hmap). Heights are quantized to uint16 and
+# stored as independently zlib-compressed chunks, so one region can be read
+# without decompressing the rest of the file:
+#
+#   magic 'PGHM' | version u32 | header length u32 | header (JSON)
+#   chunk index: (offset u64, length u32) per chunk, chunk_x-major
+#   compressed chunks: little-endian uint16, (width, height) C order
+#
+# The header holds the MapParams the map was generated with, so a map can be
+# regenerated or verified from the file alone.
+
+MAGIC = b'PGHM'
+VERSION = 1
+CHUNK_SIZE = 256
+INDEX_DTYPE = np.dtype([('offset', '<u8'), ('length', '<u4')])
+
+_PREAMBLE = struct.Struct('<4sII')
+
+
+def _chunk_grid(width, height, chunk_size):
+    return -(-width // chunk_size), -(-height // chunk_size)
+
+
+def _levels(chunk):
+    if chunk.dtype == np.uint16:
+        return chunk
+    return quantize_heightmap(np.array(chunk, dtype=np.float64))
+
+
+def write_heightmap_file(path, heightmap, params, chunk_size=CHUNK_SIZE, compression=6):
+    # heightmap is a float heightmap in [0, 1] or uint16 levels, possibly a
+    # memory map; it is read and quantized one chunk at a time
+    width, height = heightmap.shape
+    chunks_x, chunks_y = _chunk_grid(width, height, chunk_size)
+    header = json.dumps({
+        'params': asdict(params),
+        'width': width,
+        'height': height,
+        'chunk_size': chunk_size,
+        'dtype': 'uint16',
+        'compression': 'zlib',
+    }).encode('utf-8')
+    index = np.zeros(chunks_x * chunks_y, dtype=INDEX_DTYPE)
+    with open(path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        index_offset = f.tell()
+        f.write(index.tobytes())  # Filled in once the chunk offsets are known
+        for i, (chunk_x, chunk_y) in enumerate(np.ndindex(chunks_x, chunks_y)):
+            x0, y0 = chunk_x * chunk_size, chunk_y * chunk_size
+            levels = _levels(heightmap[x0:x0 + chunk_size, y0:y0 + chunk_size])
+            data = zlib.compress(levels.astype('<u2').tobytes(), compression)
+            index[i] = (f.tell(), len(data))
+            f.write(data)
+        f.seek(index_offset)
+        f.write(index.tobytes())
+
+
+def generate_heightmap_file(params, path, chunk_size=CHUNK_SIZE):
+    write_heightmap_file(path, generate_heightmap_compact(params, np.uint16), params, chunk_size)
+
+
+class HeightmapFile:
+    # Random-access reader; the file is memory-mapped and chunks are
+    # decompressed on demand and kept in a byte-bounded LRU cache
+
+    def __init__(self, path, cache_bytes=64 * 2**20):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_length = _PREAMBLE.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a heightmap file")
+        if version != VERSION:
+            raise ValueError(f"unsupported heightmap file version {version}")
+        header = json.loads(self._map[_PREAMBLE.size:_PREAMBLE.size + header_length].decode('utf-8'))
+        self.header = header
+        self.params = MapParams(**header['params'])
+        self.shape = (header['width'], header['height'])
+        self.chunk_size = header['chunk_size']
+        self.chunks = _chunk_grid(*self.shape, self.chunk_size)
+        self.index = np.frombuffer(self._map, dtype=INDEX_DTYPE, count=self.chunks[0] * self.chunks[1],
+                                   offset=_PREAMBLE.size + header_length)
+        self.cache = LRUCache(cache_bytes)
+
+    def close(self):
+        self.index = None
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def chunk(self, chunk_x, chunk_y):
+        # uint16 levels of one chunk
+        levels = self.cache.get((chunk_x, chunk_y))
+        if levels is None:
+            offset, length = self.index[chunk_x * self.chunks[1] + chunk_y]
+            x0, y0 = chunk_x * self.chunk_size, chunk_y * self.chunk_size
+            shape = (min(self.chunk_size, self.shape[0] - x0), min(self.chunk_size, self.shape[1] - y0))
+            data = zlib.decompress(self._map[offset:offset + length])
+            levels = np.frombuffer(data, dtype='<u2').reshape(shape).astype(np.uint16, copy=False)
+            self.cache.put((chunk_x, chunk_y), levels)
+        return levels
+
+    def read_region(self, region=None):
+        # uint16 levels of an (x0, x1, y0, y1) region, decompressing only the
+        # chunks it overlaps
+        x0, x1, y0, y1 = region or (0, self.shape[0], 0, self.shape[1])
+        width, height = self.shape
+        if not (0 <= x0 < x1 <= width and 0 <= y0 < y1 <= height):
+            raise ValueError(f"region {(x0, x1, y0, y1)} is empty or outside the {width}x{height} map")
+        size = self.chunk_size
+        levels = np.empty((x1 - x0, y1 - y0), dtype=np.uint16)
+        for chunk_x in range(x0 // size, (x1 - 1) // size + 1):
+            for chunk_y in range(y0 // size, (y1 - 1) // size + 1):
+                chunk = self.chunk(chunk_x, chunk_y)
+                left, top = chunk_x * size, chunk_y * size
+                cx0, cx1 = max(x0, left), min(x1, left + size)
+                cy0, cy1 = max(y0, top), min(y1, top + size)
+                levels[cx0 - x0:cx1 - x0, cy0 - y0:cy1 - y0] = chunk[cx0 - left:cx1 - left, cy0 - top:cy1 - top]
+        return levels
+
+    def read_heights(self, region=None, dtype=np.float32):
+        return dequantize_heightmap(self.read_region(region), dtype)
+
+    def verify(self, max_levels=1):
+        # Regenerate the map from the header and return the chunks that differ
+        # by more than max_levels quantization levels (float32 and float64
+        # generation may round a height to adjacent levels)
+        expected = generate_heightmap_compact(self.params, np.uint16)
+        size = self.chunk_size
+        bad = []
+        for chunk_x, chunk_y in np.ndindex(*self.chunks):
+            x0, y0 = chunk_x * size, chunk_y * size
+            chunk = self.chunk(chunk_x, chunk_y).astype(np.int32)
+            if np.abs(chunk - expected[x0:x0 + size, y0:y0 + size]).max() > max_levels:
+                bad.append((chunk_x, chunk_y))
+        return bad
@@ -0,0 +1,132 @@
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from .cache import LRUCache
+from . import perlin, simplex
+from .profiling import profiled
+
+# fBm evaluated one octave layer at a time, with every layer and every partial
+# sum cached. Adding an octave costs one new layer and one multiply-add;
+# dropping one returns the cached partial sum of the lower octaves, which is
+# cheaper than a weighted subtraction and keeps the result bit-identical to
+# evaluating the whole stack at once. The layers are accumulated in float32 in
+# the same order as the `noise` package, so results match snoise2/snoise3/
+# pnoise3 exactly.
+
+
+def _is_power_of_two(value):
+    return value > 0 and math.frexp(value)[0] == 0.5
+
+
+@dataclass(frozen=True)
+class SimplexField2:
+    # 2D simplex noise over a pixel grid, like simplex.generate_noise
+    seed: int
+    scale: float
+    width: int
+    height: int
+    x0: int = 0
+    y0: int = 0
+
+    def layer_key(self, frequency):
+        # Pixel coordinates are px / scale * frequency; for power-of-two
+        # frequencies that equals px / (scale / frequency) exactly, so fields
+        # with different scales can share layers of the same wavelength
+        if _is_power_of_two(frequency):
+            return ('simplex2', self.seed, self.scale / frequency, self.width, self.height, self.x0, self.y0)
+        return ('simplex2', self.seed, self.scale, frequency, self.width, self.height, self.x0, self.y0)
+
+    def layer(self, frequency):
+        x = (np.arange(self.x0, self.x0 + self.width, dtype=np.float64) / self.scale).astype(np.float32)
+        y = (np.arange(self.y0, self.y0 + self.height, dtype=np.float64) / self.scale).astype(np.float32)
+        table, base = simplex.seed_table(self.seed)
+        z = np.float32(base)
+        # In blocks of rows, so the noise temporaries never span the whole map
+        layer = np.empty((self.width, self.height), dtype=np.float32)
+        rows = max(1, simplex.BLOCK_PIXELS // max(self.height, 1))
+        for bx0 in range(0, self.width, rows):
+            layer[bx0:bx0 + rows] = simplex.noise2(x[bx0:bx0 + rows, None] * frequency + z,
+                                                   y[None, :] * frequency + z, table)
+        return layer
+
+
+@dataclass(frozen=True)
+class NoiseSlice3:
+    # One altitude slice of 3D simplex or Perlin noise, as in 00-just-noise.py
+    kind: str  # "simplex" or "perlin"
+    scale: float
+    width: int
+    height: int
+    altitude: float
+
+    def layer_key(self, frequency):
+        return (self.kind + '3', self.scale, frequency, self.width, self.height, self.altitude)
+
+    def layer(self, frequency):
+        x = (np.arange(self.width, dtype=np.float64) / self.scale).astype(np.float32)[:, None] * frequency
+        y = (np.arange(self.height, dtype=np.float64) / self.scale).astype(np.float32)[None, :] * frequency
+        z = np.float32(self.altitude) * frequency
+        if self.kind == "simplex":
+            return simplex.noise3(x, y, z)
+        repeat = int(1024 * frequency)
+        return perlin.noise3(x, y, z, repeat, repeat, repeat)
+
+
+def octave_weights(octaves, persistence=0.5, lacunarity=2.0):
+    # (frequency, amplitude) of every octave and the total amplitude, in float32
+    persistence = np.float32(persistence)
+    lacunarity = np.float32(lacunarity)
+    freq = np.float32(1.0)
+    amp = np.float32(1.0)
+    max_amp = np.float32(1.0)
+    weights = [(freq, amp)]
+    for _ in range(1, octaves):
+        freq *= lacunarity
+        amp *= persistence
+        max_amp += amp
+        weights.append((freq, amp))
+    return weights, max_amp
+
+
+class OctaveCache:
+
+    def __init__(self, max_bytes=256 * 2**20, cache=None):
+        self.cache = cache if cache is not None else LRUCache(max_bytes)
+
+    def layer(self, field, frequency):
+        key = field.layer_key(frequency)
+        layer = self.cache.get(key)
+        if layer is None:
+            layer = profiled('octave_layer', lambda: field.layer(frequency), frequency=frequency)
+            layer.setflags(write=False)
+            self.cache.put(key, layer)
+        return layer
+
+    def _total(self, field, weights):
+        # Un-normalized sum of the first len(weights) octaves
+        key = ('octave_total', field, tuple(weights))
+        total = self.cache.get(key)
+        if total is None:
+            freq, amp = weights[-1]
+            if len(weights) == 1:
+                total = self.layer(field, freq)
+            else:
+                total = self._total(field, weights[:-1]) + self.layer(field, freq) * amp
+                total.setflags(write=False)
+            self.cache.put(key, total)
+        return total
+
+    def fbm(self, field, octaves, persistence=0.5, lacunarity=2.0):
+        if octaves <= 0:
+            raise ValueError("Expected octaves value > 0")
+        weights, max_amp = octave_weights(octaves, persistence, lacunarity)
+        return self._total(field, [(float(f), float(a)) for f, a in weights]) / max_amp
+
+    def noise_map(self, width, height, scale, octaves, seed, x0=0, y0=0, dtype=np.float64):
+        # Cached equivalent of simplex.generate_noise
+        values = self.fbm(SimplexField2(seed, scale, width, height, x0, y0), octaves).astype(dtype, copy=False)
+        values += 1
+        values /= 2
+        return values
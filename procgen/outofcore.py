@@ -0,0 +1,40 @@
+import numpy as np
+
+from .colorize import colorize
+from .terrain import bands, finish_heightmap, noisy_gradient
+
+
+# Out-of-core generation: the map is streamed in bands into .npy files opened
+# as memory maps, so peak memory is bounded by the band size instead of the
+# map size. The min/max normalization becomes a streaming two-pass reduction:
+# pass 1 writes gradient * noise for each band and tracks the running range,
+# pass 2 normalizes each band in place, multiplies in the base noise and
+# colorizes it. The heightmap is bit-identical to terrain.generate_heightmap.
+
+def generate_heightmap_to_file(params, heightmap_path, rgb_path=None, band_size=256):
+    if params.erosion_iterations:
+        raise ValueError("erosion needs the whole heightmap in memory")
+    shape = (params.width, params.height)
+    heightmap = np.lib.format.open_memmap(heightmap_path, mode='w+', dtype=np.float64, shape=shape)
+    rgb = None
+    if rgb_path is not None:
+        rgb = np.lib.format.open_memmap(rgb_path, mode='w+', dtype=np.uint8, shape=shape + (3,))
+
+    low, high = np.inf, -np.inf
+    for region in bands(params.width, params.height, band_size):
+        x0, x1 = region[:2]
+        band = noisy_gradient(params, region)
+        heightmap[x0:x1] = band
+        low, high = min(low, band.min()), max(high, band.max())
+
+    for region in bands(params.width, params.height, band_size):
+        x0, x1 = region[:2]
+        band = finish_heightmap(params, region, heightmap[x0:x1], low, high)
+        heightmap[x0:x1] = band
+        if rgb is not None:
+            rgb[x0:x1] = colorize(band, params.threshold)
+
+    heightmap.flush()
+    if rgb is not None:
+        rgb.flush()
+    return heightmap, rgb
@@ -0,0 +1,126 @@
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .erosion import REACH, ROUND_ITERATIONS, erode, run_iterations
+from .terrain import finish_heightmap, noisy_gradient, tiles
+
+
+# Tiled multi-process heightmap generation. Workers attach to one shared-memory
+# array by name and write their tile straight into it; only tile coordinates
+# and per-tile (min, max) pairs cross the process boundary.
+#
+# Pass 1 writes gradient * noise for every tile and reduces the min/max.
+# Pass 2 normalizes each tile with the global range and multiplies in the base
+# noise in place. The result is bit-identical to terrain.generate_heightmap.
+# It is returned in the shared memory itself rather than copied out, so peak
+# memory stays at one map; the segment's name is unlinked as soon as the
+# workers are done and the mapping is closed when the array is collected.
+# Erosion, if any, runs afterwards as halo tiles in erode_parallel.
+
+def _attach(name, shape, dtype=np.float64):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _noisy_gradient_tile(name, shape, params, region):
+    shm, heightmap = _attach(name, shape)
+    x0, x1, y0, y1 = region
+    tile = noisy_gradient(params, region)
+    heightmap[x0:x1, y0:y1] = tile
+    del heightmap
+    shm.close()
+    return tile.min(), tile.max()
+
+
+def _finish_tile(name, shape, params, region, low, high):
+    shm, heightmap = _attach(name, shape)
+    x0, x1, y0, y1 = region
+    view = heightmap[x0:x1, y0:y1]
+    view[...] = finish_heightmap(params, region, view, low, high)
+    del heightmap, view
+    shm.close()
+
+
+def generate_heightmap_parallel(params, workers=None, tile_size=1024):
+    workers = workers or os.cpu_count() or 1
+    shape = (params.width, params.height)
+    regions = list(tiles(params.width, params.height, tile_size))
+    shm = shared_memory.SharedMemory(create=True, size=max(1, params.width * params.height * 8))
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(regions))) as pool:
+            futures = [pool.submit(_noisy_gradient_tile, shm.name, shape, params, region)
+                       for region in regions]
+            ranges = [future.result() for future in futures]
+            low = min(tile_low for tile_low, _ in ranges)
+            high = max(tile_high for _, tile_high in ranges)
+            futures = [pool.submit(_finish_tile, shm.name, shape, params, region, low, high)
+                       for region in regions]
+            for future in futures:
+                future.result()
+    except BaseException:
+        shm.close()
+        raise
+    finally:
+        shm.unlink()
+    # Views of the result keep it (and so the mapping) alive
+    result = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    weakref.finalize(result, shm.close)
+    if params.erosion_iterations:
+        result = erode_parallel(result, params.erosion_iterations, workers)
+    return result
+
+
+def _erode_tile(name, shape, dtype, source, region, iterations, kwargs):
+    # Run one round on a tile: read it with its halo from the source
+    # (height, water, sediment) state and write the tile into the other one
+    shm, states = _attach(name, shape, dtype)
+    width, height = shape[2:]
+    x0, x1, y0, y1 = region
+    halo = REACH * iterations
+    hx0, hx1 = max(x0 - halo, 0), min(x1 + halo, width)
+    hy0, hy1 = max(y0 - halo, 0), min(y1 + halo, height)
+    state = states[source, :, hx0:hx1, hy0:hy1].copy()
+    run_iterations(*state, iterations, kwargs)
+    states[1 - source, :, x0:x1, y0:y1] = state[:, x0 - hx0:x1 - hx0, y0 - hy0:y1 - hy0]
+    del states, state
+    shm.close()
+
+
+def erode_parallel(heightmap, iterations, workers=None, tile_size=512, round_iterations=ROUND_ITERATIONS,
+                   **kwargs):
+    # erosion.erode() split into tiles across a process pool. Height, water
+    # and sediment live in shared memory, twice: each round a tile reads its
+    # halo from one copy and writes its interior to the other, so halos are
+    # exchanged every round_iterations iterations and a tile only does
+    # (tile_size + 2 * REACH * round_iterations)**2 cells of work per
+    # iteration. The result equals erode(heightmap, iterations).
+    workers = workers or os.cpu_count() or 1
+    regions = list(tiles(*heightmap.shape, tile_size))
+    if workers == 1 or len(regions) == 1:
+        return erode(heightmap, iterations, **kwargs)
+    dtype = np.result_type(heightmap.dtype, np.float32)
+    shape = (2, 3) + heightmap.shape
+    shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * dtype.itemsize)
+    try:
+        states = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        states[0, 0] = heightmap
+        states[0, 1:] = 0
+        source = 0
+        with ProcessPoolExecutor(max_workers=min(workers, len(regions))) as pool:
+            for done in range(0, iterations, round_iterations):
+                count = min(round_iterations, iterations - done)
+                jobs = [pool.submit(_erode_tile, shm.name, shape, dtype, source, region, count, kwargs)
+                        for region in regions]
+                for job in jobs:
+                    job.result()
+                source = 1 - source
+        result = states[source, 0] + states[source, 2]
+        del states
+        return result
+    finally:
+        shm.close()
+        shm.unlink()
@@ -0,0 +1,91 @@
+# Vectorized port of the improved Perlin noise from the `noise` package
+# (noise/_perlin.c), evaluated in float32 in the same order as the C code so
+# it matches `noise.pnoise3` with its default repeat of 1024 and base 0.
+import numpy as np
+
+from .simplex import GRAD3, PERM
+
+# Gradient components pre-hashed through PERM & 15
+_PERM_GRAD_X = GRAD3[PERM & 15, 0]
+_PERM_GRAD_Y = GRAD3[PERM & 15, 1]
+_PERM_GRAD_Z = GRAD3[PERM & 15, 2]
+
+_SIX = np.float32(6.0)
+_TEN = np.float32(10.0)
+_FIFTEEN = np.float32(15.0)
+_ONE = np.float32(1.0)
+
+
+def _fade(t):
+    return t * t * t * (t * (t * _SIX - _FIFTEEN) + _TEN)
+
+
+def _lerp(t, a, b):
+    return a + t * (b - a)
+
+
+def _grad3(hashed, x, y, z):
+    # grad3(PERM[hashed], x, y, z) from the C code
+    return x * _PERM_GRAD_X[hashed] + y * _PERM_GRAD_Y[hashed] + z * _PERM_GRAD_Z[hashed]
+
+
+def _lattice(v, repeat):
+    i = np.floor(np.fmod(v, np.float32(repeat))).astype(np.intp)
+    ii = np.fmod((i + 1).astype(np.float32), np.float32(repeat)).astype(np.intp)
+    return i & 255, ii & 255
+
+
+def noise3(x, y, z, repeatx=1024, repeaty=1024, repeatz=1024):
+    x = np.asarray(x, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    z = np.asarray(z, dtype=np.float32)
+    i, ii = _lattice(x, repeatx)
+    j, jj = _lattice(y, repeaty)
+    k, kk = _lattice(z, repeatz)
+
+    x = x - np.floor(x)
+    y = y - np.floor(y)
+    z = z - np.floor(z)
+    fx, fy, fz = _fade(x), _fade(y), _fade(z)
+
+    a = PERM[i]
+    aa = PERM[a + j]
+    ab = PERM[a + jj]
+    b = PERM[ii]
+    ba = PERM[b + j]
+    bb = PERM[b + jj]
+
+    x1, y1, z1 = x - _ONE, y - _ONE, z - _ONE
+    return _lerp(fz, _lerp(fy, _lerp(fx, _grad3(aa + k, x, y, z),
+                                         _grad3(ba + k, x1, y, z)),
+                               _lerp(fx, _grad3(ab + k, x, y1, z),
+                                         _grad3(bb + k, x1, y1, z))),
+                     _lerp(fy, _lerp(fx, _grad3(aa + kk, x, y, z1),
+                                         _grad3(ba + kk, x1, y, z1)),
+                               _lerp(fx, _grad3(ab + kk, x, y1, z1),
+                                         _grad3(bb + kk, x1, y1, z1))))
+
+
+def pnoise3(x, y, z, octaves=1, persistence=0.5, lacunarity=2.0, repeatx=1024, repeaty=1024, repeatz=1024):
+    # Array equivalent of noise.pnoise3
+    if octaves <= 0:
+        raise ValueError("Expected octaves value > 0")
+    x = np.asarray(x, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    z = np.asarray(z, dtype=np.float32)
+    if octaves == 1:
+        return noise3(x, y, z, repeatx, repeaty, repeatz)
+    persistence = np.float32(persistence)
+    lacunarity = np.float32(lacunarity)
+
+    freq = np.float32(1.0)
+    amp = np.float32(1.0)
+    max_amp = np.float32(0.0)
+    total = np.float32(0.0)
+    for _ in range(octaves):
+        total = total + noise3(x * freq, y * freq, z * freq, int(repeatx * freq),
+                               int(repeaty * freq), int(repeatz * freq)) * amp
+        max_amp += amp
+        freq *= lacunarity
+        amp *= persistence
+    return total / max_amp
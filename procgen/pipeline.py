@@ -0,0 +1,132 @@
+import numpy as np
+
+from .cache import LRUCache
+from .colorize import colorize
+from .compact import dequantize_heightmap, quantize_heightmap, radial_gradient_into
+from .erosion import erode
+from .octaves import OctaveCache
+from .profiling import profiled
+from .sweep import cumulative_histogram, land_fraction_at, threshold_for_land_fraction
+from .terrain import generate_radial_gradient
+
+# create_map as an explicit pipeline of memoized stages:
+#
+#   noise ──────────────────────────────┐
+#   gradient ─┐                          ├─ heightmap ── rgb
+#   detail ───┴─ combined_gradient ─────┘
+#
+# The heightmap stage includes erosion when params.erosion_iterations is set.
+#
+# Each stage is cached under a key made only of the parameters it depends on
+# (plus the keys of its inputs), so changing the threshold only recolors and
+# changing the gradient radii reuses both noise fields. The noise fields are
+# built from cached octave layers, so changing the octave count costs at most
+# one layer. Cached arrays are read-only; the cache is bounded by bytes with
+# LRU eviction.
+#
+# Stages are float32 by default (see compact.HEIGHTMAP_TOLERANCE);
+# dtype=np.float64 reproduces generate_heightmap exactly and dtype=np.uint16
+# stores the heightmap quantized. Each stage allocates only its own result.
+
+
+def noise_key(params):
+    return ('noise', params.width, params.height, params.seed, params.scale, params.octaves)
+
+
+def detail_key(params):
+    # Same stage as noise_key, so equal scales share one cached field
+    return ('noise', params.width, params.height, params.seed, params.noise_scale, params.noise_octaves)
+
+
+def gradient_key(params):
+    return ('gradient', params.width, params.height, params.plateau_radius, params.falloff_radius)
+
+
+def combined_gradient_key(params):
+    return ('combined_gradient', gradient_key(params), detail_key(params))
+
+
+def heightmap_key(params):
+    return ('heightmap', noise_key(params), combined_gradient_key(params), params.erosion_iterations)
+
+
+def histogram_key(params):
+    return ('histogram', heightmap_key(params))
+
+
+def rgb_key(params):
+    return ('rgb', heightmap_key(params), params.threshold)
+
+
+class MapPipeline:
+
+    def __init__(self, max_bytes=256 * 2**20, dtype=np.float32):
+        self.cache = LRUCache(max_bytes)
+        self.octaves = OctaveCache(cache=self.cache)
+        self.dtype = np.dtype(dtype)
+        # Precision of the float stages
+        self.work_dtype = np.dtype(np.float32) if self.dtype == np.uint16 else self.dtype
+
+    def _memo(self, key, compute):
+        value = self.cache.get(key)
+        if value is None:
+            value = profiled(key[0], compute)
+            value.setflags(write=False)
+            self.cache.put(key, value)
+        return value
+
+    def noise(self, params):
+        return self._memo(noise_key(params), lambda: self.octaves.noise_map(
+            params.width, params.height, params.scale, params.octaves, params.seed, dtype=self.work_dtype))
+
+    def detail(self, params):
+        return self._memo(detail_key(params), lambda: self.octaves.noise_map(
+            params.width, params.height, params.noise_scale, params.noise_octaves, params.seed, dtype=self.work_dtype))
+
+    def gradient(self, params):
+        def compute():
+            if self.work_dtype == np.float64:
+                return generate_radial_gradient(params.width, params.height,
+                                                params.plateau_radius, params.falloff_radius)
+            gradient = np.empty((params.width, params.height), dtype=self.work_dtype)
+            return radial_gradient_into(gradient, params.width, params.height,
+                                        params.plateau_radius, params.falloff_radius)
+        return self._memo(gradient_key(params), compute)
+
+    def combined_gradient(self, params):
+        def compute():
+            combined_gradient = np.multiply(self.gradient(params), self.detail(params))
+            # Normalize the combined gradient in place
+            low, high = combined_gradient.min(), combined_gradient.max()
+            combined_gradient -= low
+            combined_gradient /= high - low
+            return combined_gradient
+        return self._memo(combined_gradient_key(params), compute)
+
+    def heightmap(self, params):
+        def compute():
+            heightmap = np.multiply(self.noise(params), self.combined_gradient(params))
+            if params.erosion_iterations:
+                heightmap = profiled('erosion', lambda: erode(heightmap, params.erosion_iterations))
+            if self.dtype == np.uint16:
+                return quantize_heightmap(heightmap)
+            return heightmap
+        return self._memo(heightmap_key(params), compute)
+
+    def histogram(self, params):
+        # Cumulative height histogram, in the units of threshold
+        def compute():
+            heightmap = self.heightmap(params)
+            if heightmap.dtype == np.uint16:
+                heightmap = dequantize_heightmap(heightmap)
+            return cumulative_histogram(heightmap)
+        return self._memo(histogram_key(params), compute)
+
+    def threshold_for_land(self, params, land_fraction):
+        return threshold_for_land_fraction(self.histogram(params), land_fraction)
+
+    def land_fraction(self, params):
+        return land_fraction_at(self.histogram(params), params.threshold)
+
+    def rgb(self, params):
+        return self._memo(rgb_key(params), lambda: colorize(self.heightmap(params), params.threshold))
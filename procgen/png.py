@@ -0,0 +1,32 @@
+import struct
+import zlib
+
+import numpy as np
+
+
+# Minimal truecolor PNG writer, so maps can be saved without pygame or PIL
+
+def _chunk(kind, data):
+    body = kind + data
+    return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xffffffff)
+
+
+def encode_png(rgb, compression=6):
+    # rgb is a (width, height, 3) uint8 array in the surfarray layout
+    rows = np.ascontiguousarray(np.asarray(rgb, dtype=np.uint8).transpose(1, 0, 2))
+    height, width = rows.shape[:2]
+    # Filter type 0 (None) in front of every scanline
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = rows.reshape(height, width * 3)
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        _chunk(b'IHDR', header),
+        _chunk(b'IDAT', zlib.compress(raw.tobytes(), compression)),
+        _chunk(b'IEND', b''),
+    ])
+
+
+def write_png(path, rgb, compression=6):
+    with open(path, 'wb') as f:
+        f.write(encode_png(rgb, compression))
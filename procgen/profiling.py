@@ -0,0 +1,139 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from .cache import nbytes_of
+
+# Lightweight stage instrumentation. Pipeline code wraps its stages in
+# `stage(name)`; every registered sink is called as sink('enter', record) and
+# sink('exit', record) with monotonic timestamps and, where the stage produces
+# an array, its size in bytes. With no sinks registered a stage costs one list
+# check, so the hooks stay in place in production code.
+
+_sinks = []
+_local = threading.local()
+
+
+class StageRecord:
+    __slots__ = ('name', 'start_ns', 'end_ns', 'nbytes', 'thread_id', 'depth', 'args')
+
+    def __init__(self, name, depth, args):
+        self.name = name
+        self.start_ns = time.perf_counter_ns()
+        self.end_ns = None
+        self.nbytes = 0
+        self.thread_id = threading.get_ident()
+        self.depth = depth
+        self.args = args
+
+    @property
+    def seconds(self):
+        return (self.end_ns - self.start_ns) / 1e9
+
+
+def add_sink(sink):
+    _sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    if sink in _sinks:
+        _sinks.remove(sink)
+
+
+@contextmanager
+def stage(name, **args):
+    if not _sinks:
+        yield None
+        return
+    depth = getattr(_local, 'depth', 0)
+    record = StageRecord(name, depth, args)
+    _local.depth = depth + 1
+    for sink in list(_sinks):
+        sink('enter', record)
+    try:
+        yield record
+    finally:
+        record.end_ns = time.perf_counter_ns()
+        _local.depth = depth
+        for sink in list(_sinks):
+            sink('exit', record)
+
+
+def profiled(name, compute, **args):
+    # Run compute() as a stage and record the size of what it returns
+    with stage(name, **args) as record:
+        result = compute()
+        if record is not None:
+            record.nbytes = nbytes_of(result)
+    return result
+
+
+class Recorder:
+    # Sink that keeps the most recent finished stages
+
+    def __init__(self, max_records=10000):
+        self._records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def __call__(self, event, record):
+        if event == 'exit':
+            with self._lock:
+                self._records.append(record)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def summary(self, max_depth=None):
+        # name -> (seconds, calls, bytes), in order of first completion
+        totals = {}
+        for record in self.records():
+            if max_depth is not None and record.depth > max_depth:
+                continue
+            seconds, calls, nbytes = totals.get(record.name, (0.0, 0, 0))
+            totals[record.name] = (seconds + record.seconds, calls + 1, nbytes + record.nbytes)
+        return totals
+
+    def chrome_trace(self):
+        # Trace-event JSON, loadable in chrome://tracing or Perfetto
+        pid = os.getpid()
+        events = []
+        for record in self.records():
+            args = dict(record.args, bytes=record.nbytes)
+            events.append({
+                'name': record.name,
+                'ph': 'X',
+                'ts': record.start_ns / 1000,
+                'dur': (record.end_ns - record.start_ns) / 1000,
+                'pid': pid,
+                'tid': record.thread_id,
+                'args': {key: value if isinstance(value, (int, float, str, bool)) else repr(value)
+                         for key, value in args.items()},
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+
+class LoggingSink:
+    # Sink that logs every finished stage
+
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger or logging.getLogger('procgen.profiling')
+        self.level = level
+
+    def __call__(self, event, record):
+        if event == 'exit':
+            self.logger.log(self.level, "%s%s: %.2f ms, %d bytes", '  ' * record.depth,
+                            record.name, record.seconds * 1000, record.nbytes)
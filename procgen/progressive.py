@@ -0,0 +1,59 @@
+import threading
+
+from .profiling import stage
+from .terrain import downsampled
+
+# Background regeneration with progressive refinement: a job renders the map
+# at 1/8, 1/4, 1/2 and then full resolution on a worker thread, publishing each
+# pass as it completes. Starting a new job cancels the pending one; a
+# cancelled job stops at its next pass boundary and its results are dropped.
+
+PREVIEW_FACTORS = (8, 4, 2, 1)
+
+
+class Regenerator:
+
+    def __init__(self, pipeline, factors=PREVIEW_FACTORS, on_update=None):
+        self.pipeline = pipeline
+        self.factors = factors
+        self.on_update = on_update  # Called from the worker after each pass
+        self._lock = threading.Lock()
+        self._cancel = None
+        self._pending = 0
+        self._result = None
+
+    @property
+    def busy(self):
+        return self._pending > 0
+
+    def start(self, params, preview=True):
+        with self._lock:
+            if self._cancel is not None:
+                self._cancel.set()
+            cancel = self._cancel = threading.Event()
+            self._pending += 1
+        factors = self.factors if preview else self.factors[-1:]
+        threading.Thread(target=self._run, args=(params, factors, cancel), daemon=True).start()
+
+    def _run(self, params, factors, cancel):
+        try:
+            for factor in factors:
+                if cancel.is_set():
+                    return
+                with stage('regenerate', factor=factor):
+                    rgb = self.pipeline.rgb(downsampled(params, factor))
+                with self._lock:
+                    if cancel.is_set():
+                        return
+                    self._result = (params, factor, rgb)
+                if self.on_update is not None:
+                    self.on_update()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def poll(self):
+        # Latest (params, factor, rgb) published since the last poll, or None
+        with self._lock:
+            result, self._result = self._result, None
+        return result
@@ -0,0 +1,150 @@
+import numpy as np
+
+from .cache import LRUCache
+from .colorize import colorize
+from .compact import radial_gradient_into
+from .pipeline import MapPipeline
+from .profiling import profiled
+from .simplex import FieldSpec, sample_fields
+
+# Zoomable view of one generated map. At zoom z the map is drawn at 2**z screen
+# pixels per map pixel:
+#
+#   z < 0   level -z of a mip pyramid, each level the 2x2 mean of the one
+#           below, built lazily from the full-resolution heightmap
+#   z = 0   the map itself
+#   z > 0   the visible tiles only, regenerated at 2**z times the frequency
+#           with the map's own normalization, so they add real detail
+#
+# Colorized levels and tiles are cached, and a missing detail tile can be
+# drawn from the map upscaled while it is generated elsewhere.
+
+TILE_SIZE = 256
+
+
+def downsample(heightmap):
+    # 2x2 mean; an odd last row or column is dropped. Integer (quantized)
+    # maps are summed in float32 so the block sums can't overflow, then
+    # rounded back
+    width, height = heightmap.shape[0] // 2, heightmap.shape[1] // 2
+    blocks = heightmap[:width * 2, :height * 2].reshape(width, 2, height, 2)
+    if np.issubdtype(heightmap.dtype, np.integer):
+        means = blocks.mean(axis=(1, 3), dtype=np.float32)
+        return np.rint(means, out=means).astype(heightmap.dtype)
+    return blocks.mean(axis=(1, 3), dtype=heightmap.dtype)
+
+
+class MapPyramid:
+
+    def __init__(self, params, pipeline=None, tile_size=TILE_SIZE, cache_bytes=128 * 2**20):
+        self.params = params
+        self.pipeline = pipeline if pipeline is not None else MapPipeline()
+        self.tile_size = tile_size
+        self.cache = LRUCache(cache_bytes)
+        self._range = None
+        # Color drawn outside the map: the height of the open sea
+        self.background = colorize(np.zeros(1), params.threshold)[0]
+
+    def _memo(self, key, compute):
+        value = self.cache.get(key)
+        if value is None:
+            value = compute()
+            value.setflags(write=False)
+            self.cache.put(key, value)
+        return value
+
+    def level(self, level):
+        # Heightmap at 1 / 2**level resolution
+        if level == 0:
+            return self.pipeline.heightmap(self.params)
+        return self._memo(('level', level), lambda: profiled('downsample', lambda: downsample(self.level(level - 1))))
+
+    def level_rgb(self, level):
+        return self._memo(('level_rgb', level), lambda: colorize(self.level(level), self.params.threshold))
+
+    def _combined_range(self):
+        # min/max of gradient * detail over the whole map, which normalizes
+        # the combined gradient of every detail tile
+        if self._range is None:
+            combined = np.multiply(self.pipeline.gradient(self.params), self.pipeline.detail(self.params))
+            self._range = (combined.min(), combined.max())
+        return self._range
+
+    def size(self, zoom):
+        if zoom < 0:
+            return self.level(-zoom).shape[:2]
+        factor = 2 ** zoom
+        return (self.params.width * factor, self.params.height * factor)
+
+    def detail_tile(self, zoom, tile_x, tile_y):
+        # Colorized tile of the map at 2**zoom times the resolution
+        return self._memo(('tile', zoom, tile_x, tile_y), lambda: profiled(
+            'detail_tile', lambda: self._generate_tile(zoom, tile_x, tile_y), zoom=zoom))
+
+    def cached_detail_tile(self, zoom, tile_x, tile_y):
+        return self.cache.get(('tile', zoom, tile_x, tile_y))
+
+    def _generate_tile(self, zoom, tile_x, tile_y):
+        params = self.params
+        factor = 2 ** zoom
+        width, height = self.size(zoom)
+        x0, y0 = tile_x * self.tile_size, tile_y * self.tile_size
+        x1, y1 = min(x0 + self.tile_size, width), min(y0 + self.tile_size, height)
+        low, high = self._combined_range()
+        detail, noise_map = sample_fields([FieldSpec(params.noise_scale * factor, params.noise_octaves, params.seed),
+                                           FieldSpec(params.scale * factor, params.octaves, params.seed)],
+                                          x1 - x0, y1 - y0, x0, y0, dtype=np.float32)
+        combined_gradient = np.empty((x1 - x0, y1 - y0), dtype=np.float32)
+        radial_gradient_into(combined_gradient, width, height,
+                             params.plateau_radius, params.falloff_radius, x0, y0)
+        combined_gradient *= detail
+        combined_gradient -= low
+        combined_gradient /= high - low
+        np.clip(combined_gradient, 0, 1, out=combined_gradient)
+        combined_gradient *= noise_map
+        return colorize(combined_gradient, params.threshold)
+
+    def visible_tiles(self, x, y, width, height, zoom):
+        map_width, map_height = self.size(zoom)
+        size = self.tile_size
+        x0, x1 = max(x, 0), min(x + width, map_width)
+        y0, y1 = max(y, 0), min(y + height, map_height)
+        if x0 >= x1 or y0 >= y1:
+            return []
+        return [(tile_x, tile_y)
+                for tile_x in range(x0 // size, (x1 - 1) // size + 1)
+                for tile_y in range(y0 // size, (y1 - 1) // size + 1)]
+
+    def render(self, x, y, width, height, zoom, generate=True):
+        # RGB view whose top-left pixel is (x, y) at this zoom, plus the
+        # detail tiles that were missing. With generate=False those are drawn
+        # from the full-resolution map scaled up instead of being generated.
+        view = np.empty((width, height, 3), dtype=np.uint8)
+        view[...] = self.background
+        map_width, map_height = self.size(zoom)
+        x0, x1 = max(x, 0), min(x + width, map_width)
+        y0, y1 = max(y, 0), min(y + height, map_height)
+        if x0 >= x1 or y0 >= y1:
+            return view, []
+        if zoom <= 0:
+            view[x0 - x:x1 - x, y0 - y:y1 - y] = self.level_rgb(-zoom)[x0:x1, y0:y1]
+            return view, []
+        missing = []
+        size = self.tile_size
+        for tile_x, tile_y in self.visible_tiles(x, y, width, height, zoom):
+            if generate:
+                rgb = self.detail_tile(zoom, tile_x, tile_y)
+            else:
+                rgb = self.cached_detail_tile(zoom, tile_x, tile_y)
+            left, top = tile_x * size, tile_y * size
+            tx0, tx1 = max(x0, left), min(x1, left + size)
+            ty0, ty1 = max(y0, top), min(y1, top + size)
+            if rgb is None:
+                missing.append((tile_x, tile_y))
+                xs = np.arange(tx0, tx1) >> zoom
+                ys = np.arange(ty0, ty1) >> zoom
+                rgb = self.level_rgb(0)[xs[:, None], ys[None, :]]
+                view[tx0 - x:tx1 - x, ty0 - y:ty1 - y] = rgb
+            else:
+                view[tx0 - x:tx1 - x, ty0 - y:ty1 - y] = rgb[tx0 - left:tx1 - left, ty0 - top:ty1 - top]
+        return view, missing
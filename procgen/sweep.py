@@ -0,0 +1,138 @@
+import os
+from concurrent import futures
+from dataclasses import replace
+
+import numpy as np
+
+from .colorize import shaded_bands
+from .terrain import MapParams, downsampled, generate_heightmap
+
+BAND_NAMES = ('water', 'beach', 'grass', 'hills', 'snow')
+HISTOGRAM_BINS = 65536
+
+
+def band_fractions(heightmap, threshold):
+    # Fraction of the map in each biome band of get_color
+    tops = [top for _, _, top in shaded_bands(threshold)[:-1]]
+    counts = np.bincount(np.searchsorted(tops, heightmap.ravel(), side='right'),
+                         minlength=len(BAND_NAMES))
+    return dict(zip(BAND_NAMES, (counts / heightmap.size).tolist()))
+
+
+def coastline_length(land):
+    # Number of pixel edges between land and water (4-neighbourhood)
+    return int(np.count_nonzero(land[1:] != land[:-1]) + np.count_nonzero(land[:, 1:] != land[:, :-1]))
+
+
+def _column_runs(column):
+    # (start, end) of every run of True values in a 1D boolean array
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], column, [False])).astype(np.int8)))
+    return edges[::2], edges[1::2]
+
+
+def largest_landmass(land):
+    # Area of the largest 4-connected landmass. Runs of land in each column are
+    # merged with the overlapping runs of the next column via union-find.
+    parent = []
+    areas = []
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    previous = None
+    for column in land:
+        starts, ends = _column_runs(column)
+        first = len(parent)
+        for start, end in zip(starts, ends):
+            parent.append(len(parent))
+            areas.append(int(end - start))
+        if previous is not None:
+            prev_first, prev_starts, prev_ends = previous
+            i = j = 0
+            while i < len(prev_starts) and j < len(starts):
+                if prev_starts[i] < ends[j] and starts[j] < prev_ends[i]:
+                    a, b = find(prev_first + i), find(first + j)
+                    if a != b:
+                        parent[b] = a
+                        areas[a] += areas[b]
+                if prev_ends[i] < ends[j]:
+                    i += 1
+                else:
+                    j += 1
+        previous = (first, starts, ends)
+    return max((areas[i] for i in range(len(parent)) if parent[i] == i), default=0)
+
+
+def cumulative_histogram(heightmap, bins=HISTOGRAM_BINS):
+    # (2, bins + 1) array: bin edges over the map's range, and the number of
+    # heights below each edge (the last count includes the maximum). The
+    # first count is the number of heights equal to the minimum instead of 0:
+    # the open sea is all exactly 0, and spreading it over the first bin would
+    # put thresholds just above 0 far from the land they leave.
+    low, high = float(heightmap.min()), float(heightmap.max())
+    counts, edges = np.histogram(heightmap, bins=bins, range=(low, high if high > low else low + 1))
+    below = np.concatenate(([0], np.cumsum(counts)))
+    below[0] = np.count_nonzero(heightmap == low)
+    return np.stack([edges, below]).astype(np.float64)
+
+
+def threshold_for_land_fraction(histogram, land_fraction):
+    # Threshold that leaves land_fraction of the map at or above it, by
+    # linear interpolation inside the histogram bin holding that quantile.
+    # Heights at the minimum can't be split, so asking for more land than lies
+    # above them gives the smallest threshold above the minimum (the next
+    # float32, so float32 heightmaps compare the same way).
+    edges, below = histogram
+    target = (1 - min(max(land_fraction, 0.0), 1.0)) * below[-1]
+    if target <= 0:
+        return float(edges[0])
+    if target <= below[0]:
+        return float(np.nextafter(np.float32(edges[0]), np.float32(np.inf)))
+    i = int(np.clip(np.searchsorted(below, target, side='left'), 1, len(below) - 1))
+    count = below[i] - below[i - 1]
+    t = (target - below[i - 1]) / count if count else 0.0
+    return float(edges[i - 1] + t * (edges[i] - edges[i - 1]))
+
+
+def land_fraction_at(histogram, threshold):
+    # Fraction of heights >= threshold
+    edges, below = histogram
+    if threshold <= edges[0]:
+        return 1.0
+    return float(1 - np.interp(threshold, edges, below) / below[-1])
+
+
+def map_statistics(heightmap, threshold, pixel_area=1):
+    land = heightmap >= threshold
+    return {
+        'bands': band_fractions(heightmap, threshold),
+        'land_fraction': float(np.count_nonzero(land) / land.size),
+        'coastline_length': coastline_length(land) * pixel_area ** 0.5,
+        'largest_landmass': largest_landmass(land) * pixel_area,
+    }
+
+
+def seed_statistics(params, downsample=1):
+    # Statistics for one seed; with downsample > 1 the map is generated at
+    # 1/downsample resolution and lengths/areas are scaled back up
+    params = downsampled(params, downsample)
+    heightmap = generate_heightmap(params)
+    stats = map_statistics(heightmap, params.threshold, downsample * downsample)
+    stats['seed'] = params.seed
+    return stats
+
+
+def sweep_seeds(seeds, params=None, workers=None, downsample=1):
+    # Generate every seed across a process pool, keeping only the summary
+    # statistics; results come back in the order of `seeds`
+    params = params or MapParams()
+    jobs = [replace(params, seed=seed) for seed in seeds]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return [seed_statistics(job, downsample) for job in jobs]
+    with futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        chunksize = max(1, len(jobs) // (workers * 4))
+        return list(pool.map(seed_statistics, jobs, [downsample] * len(jobs), chunksize=chunksize))
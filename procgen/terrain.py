@@ -0,0 +1,142 @@
+from dataclasses import dataclass, replace
+
+import numpy as np
+
+from .profiling import profiled
+from .simplex import FieldSpec, generate_noise, sample_fields
+
+RANDOM_SEEDS = 2**32  # random_seed() range; any seed up to simplex.MAX_SEED works
+
+
+@dataclass(frozen=True)
+class MapParams:
+    width: int = 800
+    height: int = 600
+    seed: int = 0
+    scale: float = 200.0  # Larger scale for more contiguous areas
+    octaves: int = 4  # Fewer octaves for less detail
+    noise_scale: float = 150.0  # Noise applied to the radial gradient
+    noise_octaves: int = 4
+    plateau_radius: float = 0.2
+    falloff_radius: float = 0.7
+    threshold: float = 0.2  # Adjust this value to control the land-water ratio
+    erosion_iterations: int = 0  # Erosion passes over the finished heightmap; 0 skips erosion
+
+
+def random_seed():
+    return int(np.random.randint(0, RANDOM_SEEDS, dtype=np.int64))
+
+
+def downsampled(params, factor):
+    # The same map at 1/factor resolution (noise scales shrink with the grid)
+    if factor == 1:
+        return params
+    return replace(params, width=max(1, params.width // factor), height=max(1, params.height // factor),
+                   scale=params.scale / factor, noise_scale=params.noise_scale / factor)
+
+
+def full_region(width, height):
+    # Regions are (x0, x1, y0, y1) half-open pixel ranges of the full map
+    return (0, width, 0, height)
+
+
+def tiles(width, height, tile_size):
+    for x0 in range(0, width, tile_size):
+        for y0 in range(0, height, tile_size):
+            yield (x0, min(x0 + tile_size, width), y0, min(y0 + tile_size, height))
+
+
+def bands(width, height, band_size):
+    # Full-height bands along the first axis, contiguous in a (width, height) array
+    for x0 in range(0, width, band_size):
+        yield (x0, min(x0 + band_size, width), 0, height)
+
+
+def generate_radial_gradient(width, height, plateau_radius=0.2, falloff_radius=0.7, region=None):
+    # Create 1D arrays using linspace
+    x = np.linspace(-1, 1, width)
+    y = np.linspace(-1, 1, height)
+    # The largest distance is always at a corner, so the normalization is
+    # known up front and a region gets the same values as the full map
+    max_distance = np.sqrt(np.max(x**2) + np.max(y**2))
+    if region is not None:
+        x0, x1, y0, y1 = region
+        x, y = x[x0:x1], y[y0:y1]
+    # Create 2D grid using meshgrid
+    X, Y = np.meshgrid(x, y, indexing='ij')  # Ensure correct shape with indexing='ij'
+    # Compute the normalized distance from the center, so the maximum is 1
+    R = np.sqrt(X**2 + Y**2) / max_distance
+    # Define the gradient function with a plateau and sharp falloff
+    gradient = np.piecewise(R,
+                        [R <= plateau_radius,
+                         (R > plateau_radius) & (R <= falloff_radius),
+                         R > falloff_radius],
+                        [1,
+                         lambda R: 0.5 * (1 + np.cos(np.pi * (R - plateau_radius) / (falloff_radius - plateau_radius))),
+                         0])
+    return gradient
+
+
+def add_noise(width, height, gradient, noise_scale, noise_seed):
+    noise_map = generate_noise(width, height, noise_scale, 4, noise_seed)
+    combined_gradient = np.multiply(gradient, noise_map, out=noise_map)
+    # Normalize the combined gradient in place
+    low, high = combined_gradient.min(), combined_gradient.max()
+    combined_gradient -= low
+    combined_gradient /= high - low
+    return combined_gradient
+
+
+# add_noise and the final multiply, split at the global min/max reduction so
+# the map can be produced tile by tile. Each step is elementwise, so any tiling
+# gives exactly the same values as the whole-map computation.
+
+def map_fields(params):
+    # The base noise and the detail noise of the gradient, for sample_fields
+    return [FieldSpec(params.scale, params.octaves, params.seed),
+            FieldSpec(params.noise_scale, params.noise_octaves, params.seed)]
+
+
+def noisy_gradient(params, region, detail=None):
+    # detail, if given, is the detail noise of the region, already sampled
+    x0, x1, y0, y1 = region
+    gradient = generate_radial_gradient(params.width, params.height,
+                                        params.plateau_radius, params.falloff_radius, region)
+    if detail is None:
+        detail = generate_noise(x1 - x0, y1 - y0, params.noise_scale,
+                                params.noise_octaves, params.seed, x0, y0)
+    gradient *= detail
+    return gradient
+
+
+def finish_heightmap(params, region, combined_gradient, low, high, noise_map=None):
+    # noise_map, if given, is the base noise of the region and is overwritten
+    x0, x1, y0, y1 = region
+    if noise_map is None:
+        noise_map = generate_noise(x1 - x0, y1 - y0, params.scale, params.octaves,
+                                   params.seed, x0, y0)
+    # Normalize the combined gradient with the whole map's range; the input
+    # may be a shared or memory-mapped buffer, so only noise_map is updated
+    normalized = combined_gradient - low
+    normalized /= high - low
+    noise_map *= normalized
+    return noise_map
+
+
+def generate_heightmap(params):
+    # Both noise fields are sampled in one pass, into separate arrays so the
+    # detail field can be freed once it is used; the base field is kept until
+    # the combined gradient's range is known and becomes the heightmap
+    region = full_region(params.width, params.height)
+    fields = [np.empty((params.width, params.height)) for _ in range(2)]
+    noise_map, detail = profiled('sample_fields', lambda: sample_fields(map_fields(params), params.width, params.height,
+                                                                        out=fields))
+    combined_gradient = profiled('noisy_gradient', lambda: noisy_gradient(params, region, detail))
+    del fields, detail
+    low, high = combined_gradient.min(), combined_gradient.max()
+    heightmap = profiled('finish_heightmap', lambda: finish_heightmap(params, region, combined_gradient, low, high,
+                                                                      noise_map))
+    if params.erosion_iterations:
+        from .erosion import erode  # erosion imports this module
+        heightmap = profiled('erosion', lambda: erode(heightmap, params.erosion_iterations))
+    return heightmap
@@ -0,0 +1,230 @@
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, replace
+
+from .cache import LRUCache
+from .colorize import colorize
+from .png import encode_png
+from .simplex import MAX_SEED
+from .terrain import MapParams
+from .world import CHUNK_SIZE, generate_chunk
+
+# XYZ tile server for the infinite world: GET /{seed}/{z}/{x}/{y}.png returns
+# the 256x256 world chunk (x, y) at zoom z, colorized with the get_color biome
+# rules. Tiles are generated in a process pool; finished PNGs are kept in a
+# memory LRU and an on-disk LRU, and concurrent requests for the same tile
+# wait on the one generation already in flight. Cached tiles are keyed by a
+# hash of the map parameters as well, so a server restarted with different
+# parameters never serves stale tiles. A tile that fails to generate gets a
+# 500 response, and a pool broken by a dead worker is replaced. Only the
+# standard library (asyncio) serves HTTP.
+
+MAX_ZOOM = 20
+TILE_PATH = re.compile(r'^/(\d+)/(\d+)/(-?\d+)/(-?\d+)\.png$')
+
+LOGGER = logging.getLogger(__name__)
+
+
+def params_key(params):
+    # Short hash of everything but the seed, which is part of the tile path
+    fields = asdict(params)
+    del fields['seed']
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def render_tile(params, zoom, tile_x, tile_y):
+    # Runs in a worker process
+    heights = generate_chunk(params, tile_x, tile_y, zoom, CHUNK_SIZE)
+    return encode_png(colorize(heights, params.threshold))
+
+
+class DiskCache:
+    # Files under a directory, evicted least recently used first once they
+    # exceed max_bytes. Recency survives restarts through file mtimes.
+
+    def __init__(self, directory, max_bytes=1 * 2**30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        # get and put run on executor threads; the lock guards the bookkeeping
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        found = []
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                found.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(found):
+            self._entries[os.path.relpath(path, directory)] = size
+            self.nbytes += size
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+        path = os.path.join(self.directory, key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.nbytes -= self._entries.pop(key, 0)
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return data
+
+    def put(self, key, data):
+        path = os.path.join(self.directory, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary name first so a crash never leaves a partial tile
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, path)
+        evicted = []
+        with self._lock:
+            self.nbytes += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                old_key, size = self._entries.popitem(last=False)
+                self.nbytes -= size
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(os.path.join(self.directory, old_key))
+            except FileNotFoundError:
+                pass
+
+
+class TileServer:
+
+    def __init__(self, params=None, cache_dir='tiles', workers=None,
+                 memory_bytes=64 * 2**20, disk_bytes=1 * 2**30):
+        self.params = params or MapParams()
+        self.memory = LRUCache(memory_bytes, sizeof=len)
+        self.disk = DiskCache(cache_dir, disk_bytes) if cache_dir else None
+        self.params_key = params_key(self.params)
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = self._new_pool()
+        self._in_flight = {}
+        self.generated = 0
+
+    def _new_pool(self):
+        # Spawned, not forked: forked workers inherit the listening and client
+        # sockets and keep connections open after the server closes them
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+
+    async def tile(self, seed, zoom, tile_x, tile_y):
+        # PNG bytes of one tile, from the caches or generated once
+        key = f"{self.params_key}/{seed}/{zoom}/{tile_x}/{tile_y}.png"
+        data = self.memory.get(key)
+        if data is not None:
+            return data
+        future = self._in_flight.get(key)
+        if future is None:
+            future = self._in_flight[key] = asyncio.ensure_future(self._load(key, seed, zoom, tile_x, tile_y))
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _load(self, key, seed, zoom, tile_x, tile_y):
+        loop = asyncio.get_running_loop()
+        data = None
+        if self.disk is not None:
+            data = await loop.run_in_executor(None, self.disk.get, key)
+        if data is None:
+            params = replace(self.params, seed=seed)
+            pool = self.pool
+            try:
+                data = await loop.run_in_executor(pool, render_tile, params, zoom, tile_x, tile_y)
+            except BrokenProcessPool:
+                # A worker died and took the pool with it; later tiles get a new one
+                if self.pool is pool:
+                    self.pool = self._new_pool()
+                    pool.shutdown(wait=False)
+                raise
+            self.generated += 1
+            if self.disk is not None:
+                await loop.run_in_executor(None, self.disk.put, key, data)
+        self.memory.put(key, data)
+        return data
+
+    async def handle(self, reader, writer):
+        # HTTP/1.1 with keep-alive; only GET of tile paths is supported
+        try:
+            while True:
+                request = await reader.readline()
+                if not request:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                status, body = await self.respond(request.decode('latin-1').split())
+                writer.write(
+                    f"HTTP/1.1 {status}\r\n"
+                    f"Content-Type: {'image/png' if status.startswith('200') else 'text/plain'}\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Access-Control-Allow-Origin: *\r\n"
+                    f"Cache-Control: {'no-store' if status.startswith('5') else 'public, max-age=86400'}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, request):
+        if len(request) != 3:
+            return '400 Bad Request', b'bad request\n'
+        method, path, _ = request
+        if method != 'GET':
+            return '405 Method Not Allowed', b'only GET is supported\n'
+        match = TILE_PATH.match(path.split('?')[0])
+        if match is None:
+            return '404 Not Found', b'expected /{seed}/{z}/{x}/{y}.png\n'
+        seed, zoom, tile_x, tile_y = (int(group) for group in match.groups())
+        if zoom > MAX_ZOOM:
+            return '404 Not Found', b'zoom out of range\n'
+        if seed > MAX_SEED:
+            return '404 Not Found', b'seed out of range\n'
+        try:
+            return '200 OK', await self.tile(seed, zoom, tile_x, tile_y)
+        except Exception:
+            LOGGER.exception("failed to generate tile %s/%s/%s/%s", seed, zoom, tile_x, tile_y)
+            return '500 Internal Server Error', b'tile generation failed\n'
+
+    async def serve(self, host='127.0.0.1', port=8000):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+def serve(host='127.0.0.1', port=8000, **kwargs):
+    server = TileServer(**kwargs)
+    try:
+        asyncio.run(server.serve(host, port))
+    finally:
+        server.close()
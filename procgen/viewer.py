@@ -0,0 +1,38 @@
+import pygame
+
+# pygame front end shared by main.py and the numbered scripts. This is the only
+# procgen module that imports pygame, and `import procgen` does not import it,
+# so generation code, worker processes and the CLI start without SDL.
+
+
+def init(width, height, caption="2D Noise Terrain"):
+    pygame.init()
+    window = pygame.display.set_mode((width, height))
+    pygame.display.set_caption(caption)
+    return window
+
+
+def make_surface(rgb):
+    # (width, height, 3) uint8 RGB to a surface
+    return pygame.surfarray.make_surface(rgb)
+
+
+def run(create_map, width, height, caption="2D Noise Terrain"):
+    # Show create_map(width, height); R makes a new map and Q quits. The loop
+    # sleeps in pygame.event.wait() and only redraws after an event.
+    window = init(width, height, caption)
+    pygame.event.set_blocked(pygame.MOUSEMOTION)
+    surface = create_map(width, height)
+    running = True
+    while running:
+        window.blit(surface, (0, 0))
+        pygame.display.flip()
+
+        for event in [pygame.event.wait()] + pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_q:
+                    running = False
+                if event.key == pygame.K_r:
+                    surface = create_map(width, height)
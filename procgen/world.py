@@ -0,0 +1,54 @@
+import numpy as np
+
+from .cache import LRUCache
+from .colorize import colorize
+from .simplex import FieldSpec, sample_fields
+
+# Infinite world mode. The world has no radial gradient: a chunk's height is
+# the base noise times the detail noise, both sampled at world coordinates.
+# A pixel's world coordinate is its global pixel index divided by
+# scale * 2**zoom, so every chunk computes exactly the values the same pixels
+# would get in any other chunk and seams match bit-for-bit. Like the `noise`
+# package, the simplex lattice repeats every 256 noise units.
+
+CHUNK_SIZE = 256
+
+
+def generate_chunk(params, chunk_x, chunk_y, zoom=0, chunk_size=CHUNK_SIZE):
+    x0, y0 = chunk_x * chunk_size, chunk_y * chunk_size
+    zoom_factor = 2.0 ** zoom
+    base, detail = sample_fields([FieldSpec(params.scale * zoom_factor, params.octaves, params.seed),
+                                  FieldSpec(params.noise_scale * zoom_factor, params.noise_octaves, params.seed)],
+                                 chunk_size, chunk_size, x0, y0)
+    return base * detail
+
+
+class ChunkedWorld:
+    # Generates colorized chunks on demand, addressed by
+    # (seed, chunk_x, chunk_y, zoom), and keeps them in a byte-bounded LRU cache
+
+    def __init__(self, params, chunk_size=CHUNK_SIZE, cache_bytes=256 * 2**20):
+        self.params = params
+        self.chunk_size = chunk_size
+        self.cache = LRUCache(cache_bytes)
+
+    def chunk(self, chunk_x, chunk_y, zoom=0):
+        key = (self.params.seed, chunk_x, chunk_y, zoom)
+        rgb = self.cache.get(key)
+        if rgb is None:
+            heights = generate_chunk(self.params, chunk_x, chunk_y, zoom, self.chunk_size)
+            rgb = self.cache.put(key, colorize(heights, self.params.threshold))
+        return rgb
+
+    def render(self, x, y, width, height, zoom=0):
+        # RGB view of the world whose top-left pixel is global pixel (x, y)
+        size = self.chunk_size
+        view = np.empty((width, height, 3), dtype=np.uint8)
+        for chunk_x in range(x // size, (x + width - 1) // size + 1):
+            for chunk_y in range(y // size, (y + height - 1) // size + 1):
+                rgb = self.chunk(chunk_x, chunk_y, zoom)
+                left, top = chunk_x * size, chunk_y * size
+                x0, x1 = max(x, left), min(x + width, left + size)
+                y0, y1 = max(y, top), min(y + height, top + size)
+                view[x0 - x:x1 - x, y0 - y:y1 - y] = rgb[x0 - left:x1 - left, y0 - top:y1 - top]
+        return view